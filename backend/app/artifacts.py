@@ -0,0 +1,221 @@
+"""
+Native model artifacts.
+Converts the pickled models into checksummed native files (XGBoost UBJ booster, memory-mapped .npy
+arrays) and loads them back without unpickling.
+
+Usage (from the backend directory):
+    python -m app.artifacts convert [--models-dir models]
+    python -m app.artifacts verify [--models-dir models]
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+
+import numpy as np
+
+try:
+    import xgboost as xgb
+    XGBOOST_AVAILABLE = True
+except ImportError:
+    XGBOOST_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+
+NATIVE_MODEL_FILE = 'xgboost_model.ubj'
+NATIVE_REVIEWS_FILE = 'processed_reviews.npy'
+
+# The model file is always checksummed at load. Hashing the processed reviews array reads the
+# whole file, which costs more than unpickling it, so by default only its size is checked at
+# startup; set to 1 to also verify its checksum (`python -m app.artifacts verify` always does)
+VERIFY_ARTIFACTS = os.getenv('FAKEBUSTER_VERIFY_ARTIFACTS', '0') == '1'
+
+
+class ArtifactError(Exception):
+    """Raised when native artifacts are missing, unsupported or fail verification"""
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(review_model: Any, model_bytes: Optional[bytes] = None) -> str:
+    """
+    Version tag of a review model, from its booster's raw UBJ bytes so the pickle and the native
+    artifact of one model get the same tag (the .ubj file also holds the wrapper's parameters).
+    Models without a booster are tagged by the bytes they were loaded from.
+    """
+    get_booster = getattr(review_model, 'get_booster', None)
+    if get_booster is not None:
+        model_bytes = bytes(get_booster().save_raw(raw_format='ubj'))
+    if model_bytes is None:
+        raise ArtifactError(f"Cannot derive a version for {type(review_model).__name__}")
+    return f"xgboost-{hashlib.sha256(model_bytes).hexdigest()[:12]}"
+
+
+def read_manifest(models_dir: str) -> Optional[Dict[str, Any]]:
+    """Return the artifact manifest of a models directory, or None when it has none"""
+    path = os.path.join(models_dir, MANIFEST_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _artifact_entry(models_dir: str, filename: str, artifact_format: str, **extra) -> Dict[str, Any]:
+    path = os.path.join(models_dir, filename)
+    return {
+        'file': filename,
+        'format': artifact_format,
+        'size': os.path.getsize(path),
+        'sha256': file_sha256(path),
+        **extra,
+    }
+
+
+def _replace_with(path: str, write: Callable[[str], Any]) -> None:
+    """Write a file through write(temporary path) and move it into place atomically"""
+    root, extension = os.path.splitext(path)
+    # The extension is kept last: xgboost and numpy pick the format from it
+    tmp_path = f"{root}.tmp{extension}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_json(path: str, value: Any) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(value, f, indent=2)
+
+
+def convert_models(models_dir: str, model_file: str = 'xgboost_model.pkl', reviews_file: str = 'processed_reviews.pkl') -> Dict[str, Any]:
+    """Convert the pickled model files of a directory to native artifacts and write the manifest"""
+    if not XGBOOST_AVAILABLE:
+        raise ArtifactError("xgboost is required to convert the review model")
+
+    with open(os.path.join(models_dir, model_file), 'rb') as f:
+        review_model = pickle.load(f)
+    if not isinstance(review_model, xgb.XGBModel):
+        raise ArtifactError(f"Unsupported review model type: {type(review_model).__name__}")
+
+    # Every file is replaced atomically and the manifest last, so a loader never pairs a
+    # manifest with half-written artifacts
+    _replace_with(os.path.join(models_dir, NATIVE_MODEL_FILE), review_model.save_model)
+    artifacts = {
+        'review_model': _artifact_entry(
+            models_dir, NATIVE_MODEL_FILE, 'xgboost-ubj',
+            estimator=type(review_model).__name__,
+        )
+    }
+
+    reviews_path = os.path.join(models_dir, reviews_file)
+    if os.path.exists(reviews_path):
+        with open(reviews_path, 'rb') as f:
+            processed_reviews = pickle.load(f)
+        try:
+            array = np.asarray(processed_reviews)
+        except Exception:
+            array = None
+        if array is not None and array.dtype != object:
+            _replace_with(
+                os.path.join(models_dir, NATIVE_REVIEWS_FILE),
+                lambda tmp_path: np.save(tmp_path, array, allow_pickle=False),
+            )
+            artifacts['processed_reviews'] = _artifact_entry(
+                models_dir, NATIVE_REVIEWS_FILE, 'npy',
+                shape=list(array.shape), dtype=str(array.dtype),
+            )
+        else:
+            # Arbitrary Python objects have no native layout; they stay pickled
+            logger.warning(f"{reviews_file} holds {type(processed_reviews).__name__}; keeping the pickle")
+            artifacts['processed_reviews'] = _artifact_entry(models_dir, reviews_file, 'pickle')
+
+    manifest = {'format_version': MANIFEST_FORMAT_VERSION, 'artifacts': artifacts}
+    _replace_with(os.path.join(models_dir, MANIFEST_FILE), lambda tmp_path: _write_json(tmp_path, manifest))
+    return manifest
+
+
+def _verified_path(models_dir: str, entry: Dict[str, Any], verify: bool) -> str:
+    path = os.path.join(models_dir, entry['file'])
+    if not os.path.exists(path):
+        raise ArtifactError(f"Artifact file missing: {entry['file']}")
+    if os.path.getsize(path) != entry['size']:
+        raise ArtifactError(f"Size mismatch for {entry['file']}")
+    if verify and file_sha256(path) != entry['sha256']:
+        raise ArtifactError(f"Checksum mismatch for {entry['file']}")
+    return path
+
+
+def load_artifacts(models_dir: str, manifest: Dict[str, Any], verify: bool = VERIFY_ARTIFACTS) -> Tuple[Any, Any, str]:
+    """Load (review_model, processed_reviews, version) from native artifacts"""
+    if manifest.get('format_version') != MANIFEST_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported manifest format: {manifest.get('format_version')}")
+
+    artifacts = manifest['artifacts']
+    model_entry = artifacts['review_model']
+    if model_entry['format'] != 'xgboost-ubj':
+        raise ArtifactError(f"Unsupported review model format: {model_entry['format']}")
+    if not XGBOOST_AVAILABLE:
+        raise ArtifactError("xgboost is required to load the review model")
+
+    # The model file is small, so it is always verified
+    model_path = _verified_path(models_dir, model_entry, verify=True)
+    review_model = getattr(xgb, model_entry.get('estimator', 'XGBClassifier'), xgb.XGBClassifier)()
+    review_model.load_model(model_path)
+
+    processed_reviews = None
+    reviews_entry = artifacts.get('processed_reviews')
+    if reviews_entry is not None:
+        reviews_path = _verified_path(models_dir, reviews_entry, verify)
+        if reviews_entry['format'] == 'npy':
+            # Memory-mapped read-only: pages are loaded on demand and shared through the page cache
+            processed_reviews = np.load(reviews_path, mmap_mode='r', allow_pickle=False)
+        else:
+            with open(reviews_path, 'rb') as f:
+                processed_reviews = pickle.load(f)
+
+    version = model_version(review_model)
+    return review_model, processed_reviews, version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert or verify native model artifacts")
+    parser.add_argument('command', choices=['convert', 'verify'])
+    parser.add_argument('--models-dir', default=os.getenv('FAKEBUSTER_MODELS_DIR', 'models'))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == 'convert':
+            manifest = convert_models(args.models_dir)
+        else:
+            manifest = read_manifest(args.models_dir)
+            if manifest is None:
+                raise ArtifactError(f"No {MANIFEST_FILE} in {args.models_dir}")
+            load_artifacts(args.models_dir, manifest, verify=True)
+    except (ArtifactError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(manifest, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,465 @@
+"""
+Malicious domain blocklist engine.
+Blocked domains are stored as a sorted array of 64-bit hashes next to one packed byte buffer of
+the names, so millions of domains take ~32 bytes each. A host is blocked when it, or any of its
+parent domains, is in the list; lookups binary-search the hashes of the host's suffixes.
+Clients sync the list by version: each published version records its additions and removals,
+so a client that is a few versions behind downloads only the changes.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from collections import deque
+from urllib.parse import urlsplit
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Largest number of hosts accepted by one batch lookup
+MAX_LOOKUP_HOSTS = int(os.getenv('FAKEBUSTER_MAX_LOOKUP_HOSTS', '10000'))
+# Past versions clients can sync from with a delta; older clients download the full list
+BLOCKLIST_HISTORY = int(os.getenv('FAKEBUSTER_BLOCKLIST_HISTORY', '32'))
+# Domains buffered as Python objects while building an index before they are packed
+BUILD_CHUNK_SIZE = int(os.getenv('FAKEBUSTER_BLOCKLIST_BUILD_CHUNK_SIZE', '500000'))
+
+# Built-in list, always included alongside the configured threat intelligence feeds
+DEFAULT_MALICIOUS_DOMAINS = [
+    'fakeshop-scam.com',
+    'phishing-site.net',
+    'malware-download.org',
+    'scam-crypto.com',
+    'fake-login.net',
+    'trojan-installer.site',
+    'data-stealer.xyz',
+    'bank-phishing.info',
+    'free-virus.com',
+    'spam-center.net',
+    'malicious-downloads.co',
+    'credential-theft.org',
+    'ransomware-host.com',
+]
+
+# Normalized host names: at least two labels, so no feed line can block a whole TLD, and no
+# wildcards. Values that already match (the bulk of most feeds) skip the full parsing
+_NORMALIZED_HOST_PATTERN = re.compile(r'[a-z0-9_-]+(?:\.[a-z0-9_-]+)+')
+
+# Snapshot file: magic, format, blocklist version, domains, name bytes; then the hashes, the
+# offsets and the packed names
+_SNAPSHOT_MAGIC = b'FBBL'
+_SNAPSHOT_FORMAT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<4sB3x16sQQ')
+
+
+def normalize_host(value: str) -> Optional[str]:
+    """
+    Lowercase ASCII (IDNA) host name of a host, host:port or URL, without trailing dot.
+    Returns None for values that are not host names, including wildcards and single labels.
+    """
+    if _NORMALIZED_HOST_PATTERN.fullmatch(value):
+        return value
+    value = value.strip()
+    if not value:
+        return None
+    if '/' in value or '@' in value:
+        host = urlsplit(value if '//' in value else f"//{value}").hostname
+        if not host:
+            return None
+    else:
+        host = value.rsplit(':', 1)[0] if value.count(':') == 1 else value
+
+    host = host.strip().rstrip('.').lower()
+    if not host or ':' in host or ' ' in host:
+        return None
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    return host if _NORMALIZED_HOST_PATTERN.fullmatch(host) else None
+
+
+def domain_digest(domain: bytes) -> bytes:
+    """8-byte blake2b digest of a normalized domain; read little-endian it is the domain hash"""
+    return hashlib.blake2b(domain, digest_size=8).digest()
+
+
+def domain_hash(domain: str) -> int:
+    """Stable 64-bit hash of a normalized domain"""
+    return int.from_bytes(domain_digest(domain.encode('ascii')), 'little')
+
+
+def host_suffixes(host: str) -> List[str]:
+    """The host and each of its parent domains, most specific first"""
+    labels = host.split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+
+class BlocklistIndex:
+    """Immutable set of blocked domains; build a new index to change it"""
+
+    def __init__(self, hashes: np.ndarray, names: Union[bytes, memoryview], offsets: np.ndarray, version: str):
+        # hashes[i] is the hash of names[offsets[i]:offsets[i + 1]]; hashes are sorted and unique.
+        # names is a memoryview of the file for indexes loaded from a snapshot
+        self.hashes = hashes
+        self.names = names
+        self.offsets = offsets
+        self.version = version
+
+    @classmethod
+    def build(cls, domains: Iterable[str]) -> 'BlocklistIndex':
+        """Build an index from raw domains; invalid entries are skipped, duplicates collapsed"""
+        builder = BlocklistBuilder()
+        builder.add_many(domains)
+        return builder.build()
+
+    def save(self, path: str):
+        """Write the index to a snapshot file, replacing it atomically"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_SNAPSHOT_HEADER.pack(
+                    _SNAPSHOT_MAGIC, _SNAPSHOT_FORMAT_VERSION, self.version.encode('ascii'),
+                    len(self.hashes), len(self.names),
+                ))
+                f.write(self.hashes.astype('<u8', copy=False).tobytes())
+                f.write(self.offsets.astype('<i8', copy=False).tobytes())
+                f.write(self.names)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BlocklistIndex':
+        """
+        Memory-map an index from a snapshot file. Pages are read on demand and shared through
+        the page cache by every process that loads the same file.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, version, count, names_size = _SNAPSHOT_HEADER.unpack_from(mapped)
+        if magic != _SNAPSHOT_MAGIC or format_version != _SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {_SNAPSHOT_FORMAT_VERSION} blocklist snapshot")
+        position = _SNAPSHOT_HEADER.size
+        hashes = np.frombuffer(mapped, dtype='<u8', count=count, offset=position)
+        position += hashes.nbytes
+        offsets = np.frombuffer(mapped, dtype='<i8', count=count + 1, offset=position)
+        position += offsets.nbytes
+        names = memoryview(mapped)[position:position + names_size]
+        return cls(hashes, names, offsets, version.rstrip(b'\0').decode('ascii'))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __iter__(self) -> Iterator[str]:
+        names, offsets = self.names, self.offsets
+        for i in range(len(self.hashes)):
+            yield str(names[offsets[i]:offsets[i + 1]], 'ascii')
+
+    def domain_at(self, position: int) -> str:
+        return str(self.names[self.offsets[position]:self.offsets[position + 1]], 'ascii')
+
+    def _position(self, hash_value: int) -> int:
+        position = int(np.searchsorted(self.hashes, np.uint64(hash_value)))
+        if position < len(self.hashes) and int(self.hashes[position]) == hash_value:
+            return position
+        return -1
+
+    def match(self, host: str) -> Optional[str]:
+        """Blocked domain covering a normalized host (the host itself or a parent), or None"""
+        for suffix in host_suffixes(host):
+            position = self._position(domain_hash(suffix))
+            # Names are compared too, so a hash collision never blocks an unrelated host
+            if position >= 0 and self.domain_at(position) == suffix:
+                return suffix
+        return None
+
+    def match_many(self, hosts: Sequence[str]) -> List[Optional[str]]:
+        """match() for a batch of normalized hosts with one vectorized search"""
+        suffixes: List[str] = []
+        owners: List[int] = []
+        for i, host in enumerate(hosts):
+            for suffix in host_suffixes(host):
+                suffixes.append(suffix)
+                owners.append(i)
+
+        results: List[Optional[str]] = [None] * len(hosts)
+        if not suffixes or not len(self.hashes):
+            return results
+
+        suffix_hashes = np.fromiter((domain_hash(s) for s in suffixes), dtype=np.uint64, count=len(suffixes))
+        positions = np.minimum(np.searchsorted(self.hashes, suffix_hashes), len(self.hashes) - 1)
+        for j in np.flatnonzero(self.hashes[positions] == suffix_hashes).tolist():
+            # Suffixes are ordered most specific first, so the first hit per host wins
+            owner = owners[j]
+            if results[owner] is None and self.domain_at(int(positions[j])) == suffixes[j]:
+                results[owner] = suffixes[j]
+        return results
+
+    def lookup(self, values: Sequence[str]) -> List[Dict[str, Any]]:
+        """Lookup results for raw hosts or URLs, in request order"""
+        hosts = [normalize_host(value) for value in values]
+        matches = self.match_many([host for host in hosts if host is not None])
+        matched = iter(matches)
+        results = []
+        for value, host in zip(values, hosts):
+            match = next(matched) if host is not None else None
+            results.append({
+                'host': value,
+                'normalized': host,
+                'blocked': match is not None,
+                'matched_domain': match,
+            })
+        return results
+
+    def domains_at(self, positions: np.ndarray) -> List[str]:
+        return [self.domain_at(position) for position in positions.tolist()]
+
+    def diff(self, previous: 'BlocklistIndex') -> Tuple[List[str], List[str]]:
+        """(added, removed) domains going from a previous index to this one"""
+        added = np.flatnonzero(~np.isin(self.hashes, previous.hashes, assume_unique=True))
+        removed = np.flatnonzero(~np.isin(previous.hashes, self.hashes, assume_unique=True))
+        return self.domains_at(added), previous.domains_at(removed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'domains': len(self.hashes),
+            'bytes': self.hashes.nbytes + len(self.names) + self.offsets.nbytes,
+        }
+
+
+def _pack(hashes: np.ndarray, buffer: bytes, offsets: np.ndarray) -> Tuple[np.ndarray, bytes, np.ndarray]:
+    """
+    Sorted unique hashes, the names of those hashes (buffer[offsets[i]:offsets[i + 1]] for
+    hashes[i]) packed in the same order, and the offsets of the packed names
+    """
+    unique_hashes, first = np.unique(hashes, return_index=True)
+    del hashes
+    starts, ends = offsets[first], offsets[first + 1]
+    del first
+    packed_offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(ends - starts, out=packed_offsets[1:])
+    # Joined in slices so no list of all names is ever materialized
+    packed = b''.join(
+        b''.join([buffer[start:end] for start, end in zip(
+            starts[i:i + BUILD_CHUNK_SIZE].tolist(), ends[i:i + BUILD_CHUNK_SIZE].tolist()
+        )])
+        for i in range(0, len(starts), BUILD_CHUNK_SIZE)
+    )
+    return unique_hashes, packed, packed_offsets
+
+
+class BlocklistBuilder:
+    """
+    Builds a BlocklistIndex from a stream of raw domains in bounded memory.
+
+    Domains are normalized and deduplicated as they arrive; every BUILD_CHUNK_SIZE domains the
+    buffered Python objects are packed into the compact index layout, so building from a feed
+    of any length needs memory for its distinct domains only.
+    """
+
+    def __init__(self, chunk_size: int = BUILD_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self._digests: List[bytes] = []
+        self._names: List[bytes] = []
+        self._chunks: List[Tuple[np.ndarray, bytes, np.ndarray]] = []
+
+        self.accepted = 0
+        self.invalid = 0
+
+    def add(self, value: Any) -> bool:
+        """Add one raw host, URL or domain; returns False when it is not a valid host name"""
+        host = normalize_host(value) if isinstance(value, str) else None
+        if host is None:
+            self.invalid += 1
+            return False
+        name = host.encode('ascii')
+        self._digests.append(domain_digest(name))
+        self._names.append(name)
+        self.accepted += 1
+        if len(self._names) >= self.chunk_size:
+            self._flush()
+        return True
+
+    def add_many(self, values: Iterable[Any]):
+        # add() inlined with locals bound: this loop runs once per feed entry
+        digests, names, chunk_size = self._digests, self._names, self.chunk_size
+        accepted = invalid = 0
+        for value in values:
+            host = normalize_host(value) if isinstance(value, str) else None
+            if host is None:
+                invalid += 1
+                continue
+            name = host.encode('ascii')
+            digests.append(domain_digest(name))
+            names.append(name)
+            accepted += 1
+            if len(names) >= chunk_size:
+                self._flush()
+                digests, names = self._digests, self._names
+        self.accepted += accepted
+        self.invalid += invalid
+
+    def _flush(self):
+        if not self._names:
+            return
+        hashes = np.frombuffer(b''.join(self._digests), dtype='<u8').astype(np.uint64)
+        offsets = np.zeros(len(self._names) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, self._names), dtype=np.int64, count=len(self._names)), out=offsets[1:])
+        self._chunks.append(_pack(hashes, b''.join(self._names), offsets))
+        self._digests = []
+        self._names = []
+
+    def build(self) -> BlocklistIndex:
+        """The index of every domain added so far"""
+        self._flush()
+        chunks, self._chunks = self._chunks, []
+        if not chunks:
+            hashes, packed, offsets = np.empty(0, dtype=np.uint64), b'', np.zeros(1, dtype=np.int64)
+        elif len(chunks) == 1:
+            hashes, packed, offsets = chunks[0]
+        else:
+            # Merge the chunks, dropping domains repeated across them. The chunks' names are
+            # concatenated, so their offsets only need shifting by the bytes before each chunk
+            bases = np.cumsum([0] + [len(chunk_packed) for _, chunk_packed, _ in chunks])
+            offsets = np.concatenate(
+                [chunk_offsets[:-1] + base for (_, _, chunk_offsets), base in zip(chunks, bases)] + [bases[-1:]]
+            )
+            buffer = b''.join([chunk_packed for _, chunk_packed, _ in chunks])
+            hashes = np.concatenate([chunk_hashes for chunk_hashes, _, _ in chunks])
+            del chunks
+            hashes, packed, offsets = _pack(hashes, buffer, offsets)
+
+        # Content version: identical domain sets get identical versions
+        version = hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+        return BlocklistIndex(hashes, packed, offsets, version)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'accepted': self.accepted, 'invalid': self.invalid}
+
+
+class _Change:
+    __slots__ = ('added', 'removed')
+
+    def __init__(self, added: List[str], removed: List[str]):
+        self.added = added
+        self.removed = removed
+
+
+class BlocklistStore:
+    """
+    The published blocklist and the changes between its recent versions.
+
+    Only the current index is kept in memory; each older version is remembered by the domains
+    added and removed when it was replaced, so history costs memory proportional to the changes.
+    Response bodies are encoded once per version (and per delta) and reused for every client.
+    """
+
+    def __init__(self, index: BlocklistIndex, max_history: int = BLOCKLIST_HISTORY):
+        self.current = index
+        self.max_history = max(0, max_history)
+        # (version, the change that led from it to the next version), oldest first. A version that
+        # comes back (e.g. a reverted feed) appears more than once; deltas replay from its last entry
+        self._changes: "deque[Tuple[str, _Change]]" = deque()
+        self._full_body: Optional[bytes] = None
+        self._delta_bodies: Dict[str, bytes] = {}
+
+        self.published = 0
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.not_modified = 0
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    def publish(self, index: BlocklistIndex) -> bool:
+        """Make an index current; returns False when its content is already published"""
+        if index.version == self.current.version:
+            return False
+        added, removed = index.diff(self.current)
+        self._changes.append((self.current.version, _Change(added, removed)))
+        while len(self._changes) > self.max_history:
+            self._changes.popleft()
+
+        self.current = index
+        self._full_body = None
+        self._delta_bodies = {}
+        self.published += 1
+        logger.info(f"Blocklist {index.version} published: {len(index)} domains, +{len(added)} -{len(removed)}")
+        return True
+
+    def full_body(self) -> bytes:
+        """JSON body of the full list of the current version"""
+        if self._full_body is None:
+            self._full_body = json.dumps({
+                'version': self.current.version,
+                'domains': list(self.current),
+            }).encode('utf-8')
+        self.full_syncs += 1
+        return self._full_body
+
+    def delta_body(self, since: str) -> Optional[bytes]:
+        """
+        JSON body with the domains added and removed since a version, or None when that
+        version is too old (or unknown) and the client needs the full list.
+        """
+        body = self._delta_bodies.get(since)
+        if body is None:
+            changes = self._changes_since(since)
+            if changes is None:
+                return None
+            added, removed = changes
+            body = json.dumps({
+                'version': self.current.version,
+                'since': since,
+                'added': sorted(added),
+                'removed': sorted(removed),
+            }).encode('utf-8')
+            self._delta_bodies[since] = body
+        self.delta_syncs += 1
+        return body
+
+    def _changes_since(self, since: str) -> Optional[Tuple[set, set]]:
+        """Domains added and removed since a version, or None when it is not in the history"""
+        added: set = set()
+        removed: set = set()
+        if since == self.current.version:
+            return added, removed
+        history = list(self._changes)
+        versions = [version for version, _ in history]
+        if since not in versions:
+            return None
+        # Replayed from the last time the client's version was current
+        start = len(versions) - 1 - versions[::-1].index(since)
+        for _, change in history[start:]:
+            for domain in change.added:
+                if domain in removed:
+                    removed.discard(domain)
+                else:
+                    added.add(domain)
+            for domain in change.removed:
+                if domain in added:
+                    added.discard(domain)
+                else:
+                    removed.add(domain)
+        return added, removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.current.get_stats(),
+            'history_versions': len(self._changes),
+            'history_changes': sum(len(c.added) + len(c.removed) for _, c in self._changes),
+            'published': self.published,
+            'full_syncs': self.full_syncs,
+            'delta_syncs': self.delta_syncs,
+            'not_modified': self.not_modified,
+        }
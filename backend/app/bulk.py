@@ -0,0 +1,318 @@
+"""
+Offline bulk review scoring.
+Streams a JSONL, CSV or Parquet dump through the review model in fixed-size chunks scored by a
+process pool, appends results to a JSONL file and checkpoints after every chunk so an interrupted
+run can resume. At most a few chunks are held in memory, whatever the input size.
+
+Usage (from the backend directory):
+    python -m app.bulk INPUT OUTPUT [--text-field text] [--id-field id] [--workers 4] [--resume]
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from .features import extract_feature_matrix
+from .inference import FAKE_THRESHOLD, FallbackReviewClassifier, predict_fake_probabilities
+from .registry import MODELS_DIR, ModelBundle, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = int(os.getenv('FAKEBUSTER_BULK_CHUNK_SIZE', '5000'))
+INPUT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+# One input row: (row number, review id, review text); the text is None for an invalid record
+Row = Tuple[int, Any, Optional[str]]
+
+
+class BulkScoringError(Exception):
+    """Raised for unusable inputs or checkpoints"""
+
+
+# ============================================================================
+# INPUT READERS
+# ============================================================================
+
+def detect_format(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower().lstrip('.')
+    if suffix in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if suffix in ('csv', 'parquet'):
+        return suffix
+    raise BulkScoringError(f"Cannot detect the format of {path}; pass --format")
+
+
+def _iter_records(path: str, input_format: str, text_field: str, id_field: Optional[str], chunk_size: int) -> Iterator[Optional[Dict[str, Any]]]:
+    if input_format == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                # Malformed lines and JSON values other than objects are yielded as None
+                yield record if isinstance(record, dict) else None
+    elif input_format == 'csv':
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+    elif input_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise BulkScoringError("Reading Parquet requires pyarrow")
+        columns = [text_field] + ([id_field] if id_field else [])
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield from batch.to_pylist()
+    else:
+        raise BulkScoringError(f"Unknown input format: {input_format}")
+
+
+def iter_chunks(
+    path: str,
+    input_format: str,
+    text_field: str = 'text',
+    id_field: Optional[str] = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    skip_rows: int = 0,
+) -> Iterator[List[Row]]:
+    """Yield lists of at most chunk_size rows, skipping the rows already scored"""
+    chunk: List[Row] = []
+    for row_number, record in enumerate(_iter_records(path, input_format, text_field, id_field, chunk_size)):
+        if row_number < skip_rows:
+            continue
+        if record is None:
+            chunk.append((row_number, None, None))
+        else:
+            text = record.get(text_field)
+            review_id = record.get(id_field) if id_field else row_number
+            chunk.append((row_number, review_id, text if isinstance(text, str) else ''))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+_worker_bundle: Optional[ModelBundle] = None
+
+
+def _fallback_models():
+    return FallbackReviewClassifier(), None
+
+
+def load_scoring_bundle(models_dir: str) -> ModelBundle:
+    """Load the review model the same way the API does (native artifacts, pickle, then rules)"""
+    registry = ModelRegistry(models_dir, fallback_factory=_fallback_models)
+    return registry.load_bundle(warm=False)
+
+
+def _init_worker(models_dir: str):
+    global _worker_bundle
+    _worker_bundle = load_scoring_bundle(models_dir)
+
+
+def score_texts(texts: Sequence[str], bundle: Optional[ModelBundle] = None) -> np.ndarray:
+    """Fake probability per text with the worker's (or the given) model bundle"""
+    bundle = bundle or _worker_bundle
+    model = bundle.review_model
+    if getattr(model, 'accepts_texts', False):
+        return model.predict_proba(texts)[:, 1]
+    return predict_fake_probabilities(model, extract_feature_matrix(texts))
+
+
+# ============================================================================
+# CHECKPOINTS
+# ============================================================================
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path + '.checkpoint'
+
+
+def read_checkpoint(output_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(checkpoint_path(output_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(output_path: str, checkpoint: Dict[str, Any]):
+    # Written to a temporary file and renamed so a crash never leaves a torn checkpoint
+    path = checkpoint_path(output_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def format_results(chunk: Sequence[Row], probabilities: np.ndarray) -> str:
+    """Result lines of the valid rows of a chunk, in order"""
+    lines = []
+    valid_rows = [row for row in chunk if row[2] is not None]
+    for (row_number, review_id, _), fake_probability in zip(valid_rows, probabilities.tolist()):
+        lines.append(json.dumps({
+            'row': row_number,
+            'id': review_id,
+            'fake_probability': fake_probability,
+            'is_fake': fake_probability > FAKE_THRESHOLD,
+            'confidence': fake_probability if fake_probability > 0.5 else 1 - fake_probability,
+        }))
+    return ''.join(line + '\n' for line in lines)
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def run_bulk_scoring(
+    input_path: str,
+    output_path: str,
+    input_format: Optional[str] = None,
+    text_field: str = 'text',
+    id_field: Optional[str] = None,
+    models_dir: str = MODELS_DIR,
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    """Score every review of the input and return a run report"""
+    input_format = input_format or detect_format(input_path)
+    # The driver loads the model too, for the version and for inline scoring (workers=0)
+    bundle = load_scoring_bundle(models_dir)
+
+    checkpoint = read_checkpoint(output_path) if resume else None
+    if checkpoint is not None:
+        if checkpoint['input'] != os.path.abspath(input_path):
+            raise BulkScoringError(f"Checkpoint belongs to {checkpoint['input']}")
+        if checkpoint['model_version'] != bundle.version:
+            raise BulkScoringError(
+                f"Checkpoint was scored with {checkpoint['model_version']}, the current model is {bundle.version}"
+            )
+        if checkpoint['output_bytes'] > os.path.getsize(output_path):
+            raise BulkScoringError(f"{output_path} is shorter than its checkpoint")
+    else:
+        if os.path.exists(checkpoint_path(output_path)):
+            os.remove(checkpoint_path(output_path))
+        checkpoint = {
+            'input': os.path.abspath(input_path),
+            'model_version': bundle.version,
+            'rows_done': 0,
+            'invalid_rows': 0,
+            'output_bytes': 0,
+        }
+
+    output = open(output_path, 'r+b' if resume and os.path.exists(output_path) else 'wb')
+    # Drop results written after the last checkpoint; they are scored again
+    output.truncate(checkpoint['output_bytes'])
+    output.seek(checkpoint['output_bytes'])
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(models_dir,)) if workers > 0 else None
+    # Chunks submitted but not yet written; bounds memory to a few chunks per worker
+    max_pending = max(1, workers) * 2
+    pending: deque = deque()
+
+    start = time.perf_counter()
+    scored = 0
+
+    def write_next():
+        nonlocal scored
+        chunk, result = pending.popleft()
+        probabilities = result.result() if isinstance(result, Future) else result
+        output.write(format_results(chunk, probabilities).encode('utf-8'))
+        output.flush()
+        os.fsync(output.fileno())
+
+        invalid = sum(1 for _, _, text in chunk if text is None)
+        checkpoint['rows_done'] = chunk[-1][0] + 1
+        checkpoint['invalid_rows'] = checkpoint.get('invalid_rows', 0) + invalid
+        checkpoint['output_bytes'] = output.tell()
+        write_checkpoint(output_path, checkpoint)
+
+        scored += len(chunk) - invalid
+        elapsed = time.perf_counter() - start
+        logger.info(f"{checkpoint['rows_done']} rows done, {scored / elapsed:.0f} reviews/s")
+
+    try:
+        chunks = iter_chunks(input_path, input_format, text_field, id_field, chunk_size, checkpoint['rows_done'])
+        for chunk in chunks:
+            texts = [text for _, _, text in chunk if text is not None]
+            if not texts:
+                pending.append((chunk, np.zeros(0)))
+            elif executor is not None:
+                pending.append((chunk, executor.submit(score_texts, texts)))
+            else:
+                pending.append((chunk, score_texts(texts, bundle)))
+            if len(pending) >= max_pending:
+                write_next()
+        while pending:
+            write_next()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        output.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'input': input_path,
+        'output': output_path,
+        'model_version': bundle.version,
+        'rows_done': checkpoint['rows_done'],
+        'scored': scored,
+        'invalid_rows': checkpoint.get('invalid_rows', 0),
+        'seconds': elapsed,
+        'reviews_per_second': scored / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an archived review dump offline")
+    parser.add_argument('input')
+    parser.add_argument('output', help="JSONL results file")
+    parser.add_argument('--format', choices=INPUT_FORMATS, help="input format (default: from the file suffix)")
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--id-field', help="field copied to the results (default: row number)")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="scoring processes; 0 scores inline")
+    parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument('--resume', action='store_true', help="continue from the output's checkpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        report = run_bulk_scoring(
+            args.input, args.output,
+            input_format=args.format,
+            text_field=args.text_field,
+            id_field=args.id_field,
+            models_dir=args.models_dir,
+            workers=args.workers,
+            chunk_size=max(1, args.chunk_size),
+            resume=args.resume,
+        )
+    except (BulkScoringError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+In-memory LRU/TTL caches for analysis results.
+Caches are used from the event loop only and are not thread-safe.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import hashlib
+import os
+import time
+
+REVIEW_CACHE_SIZE = int(os.getenv('FAKEBUSTER_REVIEW_CACHE_SIZE', '50000'))
+REVIEW_CACHE_TTL = float(os.getenv('FAKEBUSTER_REVIEW_CACHE_TTL', '3600'))
+
+
+class LRUTTLCache:
+    """Bounded least-recently-used cache whose entries also expire after a TTL"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        # Called with (key, value) for entries dropped by the size bound or their TTL
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self.evict_oldest()
+
+    def evict_oldest(self):
+        """Drop the least recently used entry"""
+        key, (value, _) = self._entries.popitem(last=False)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def review_cache_key(text: str, model_version: str) -> str:
+    """Content address of a review scored by a given model version"""
+    # The exact text is hashed: any normalization would change the length and
+    # ratio features, so only texts that score identically share an entry
+    digest = hashlib.sha256()
+    digest.update(model_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
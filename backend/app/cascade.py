@@ -0,0 +1,106 @@
+"""
+Cheap-first review scoring cascade.
+A rule stage built from the fallback phrase heuristics and a few text features settles clear-cut
+reviews; only the uncertain ones are sent to the review model and full explanation.
+Rule scores are not calibrated probabilities, so a cheap-stage decision is reported on the model's
+scale as a fixed probability for its label (see CASCADE_DECISION_CONFIDENCE), with the rule score
+kept as cheap_score.
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+import os
+
+import numpy as np
+
+from .features import FEATURE_NAMES, extract_feature_matrix
+from .inference import FAKE_THRESHOLD, FallbackReviewClassifier
+
+CASCADE_ENABLED = os.getenv('FAKEBUSTER_CASCADE', '0') == '1'
+# Cheap scores at or below this are decided genuine; the default only exits reviews with no signal at all
+CASCADE_GENUINE_THRESHOLD = float(os.getenv('FAKEBUSTER_CASCADE_GENUINE_THRESHOLD', '0.0'))
+# Cheap scores at or above this are decided fake
+CASCADE_FAKE_THRESHOLD = float(os.getenv('FAKEBUSTER_CASCADE_FAKE_THRESHOLD', '0.9'))
+# Confidence reported for cheap-stage decisions: fake ones get this fake probability, genuine
+# ones its complement; it must keep both on their side of FAKE_THRESHOLD
+CASCADE_DECISION_CONFIDENCE = float(os.getenv('FAKEBUSTER_CASCADE_DECISION_CONFIDENCE', '0.75'))
+
+CASCADE_STAGES = ('cheap_genuine', 'cheap_fake', 'model')
+# Stage of reviews whose probability was reused from the page index; they are not counted
+REUSED_STAGE = 'page_index'
+
+_UPPERCASE_RATIO = FEATURE_NAMES.index('uppercase_ratio')
+_EXCLAMATION_COUNT = FEATURE_NAMES.index('exclamation_count')
+_HAS_EMAIL = FEATURE_NAMES.index('has_email')
+_HAS_URL = FEATURE_NAMES.index('has_url')
+
+_fallback_classifier = FallbackReviewClassifier()
+
+
+def cheap_fake_scores(texts: Sequence[str], feature_matrix: np.ndarray) -> np.ndarray:
+    """Rule-based fake score per review from the fallback phrases and contact/shouting features"""
+    # Same phrase heuristic as the fallback review classifier
+    scores = _fallback_classifier.fake_probabilities(texts)
+    scores += 0.3 * feature_matrix[:, _HAS_EMAIL] + 0.3 * feature_matrix[:, _HAS_URL]
+    scores += 0.2 * (feature_matrix[:, _UPPERCASE_RATIO] > 0.3)
+    scores += 0.1 * (feature_matrix[:, _EXCLAMATION_COUNT] > 3)
+    return np.clip(scores, 0.0, 0.99)
+
+
+def screen_reviews(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Feature matrix and cheap fake scores of a batch (one feature executor task)"""
+    feature_matrix = extract_feature_matrix(texts)
+    return feature_matrix, cheap_fake_scores(texts, feature_matrix)
+
+
+class ReviewCascade:
+    """Splits scored batches into cheap-stage decisions and reviews left for the model"""
+
+    def __init__(
+        self,
+        genuine_threshold: float = CASCADE_GENUINE_THRESHOLD,
+        fake_threshold: float = CASCADE_FAKE_THRESHOLD,
+        decision_confidence: float = CASCADE_DECISION_CONFIDENCE,
+    ):
+        if genuine_threshold >= fake_threshold:
+            raise ValueError("The genuine threshold must be below the fake threshold")
+        if not (FAKE_THRESHOLD < decision_confidence <= 1 and 1 - decision_confidence <= FAKE_THRESHOLD):
+            raise ValueError(f"The decision confidence must keep cheap decisions on their side of {FAKE_THRESHOLD}")
+        self.genuine_threshold = genuine_threshold
+        self.fake_threshold = fake_threshold
+        self.decision_confidence = decision_confidence
+        self.stage_counts = dict.fromkeys(CASCADE_STAGES, 0)
+
+    def stages(self, cheap_scores: np.ndarray, scored_rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Stage that decides each review, counted into the hit rates.
+        Rows outside scored_rows already have a probability and get REUSED_STAGE.
+        """
+        stages = np.full(len(cheap_scores), 'model', dtype=object)
+        stages[cheap_scores <= self.genuine_threshold] = 'cheap_genuine'
+        stages[cheap_scores >= self.fake_threshold] = 'cheap_fake'
+        if scored_rows is not None:
+            stages[~scored_rows] = REUSED_STAGE
+        for stage in CASCADE_STAGES:
+            self.stage_counts[stage] += int(np.count_nonzero(stages == stage))
+        return stages
+
+    def decision_probabilities(self, stages: np.ndarray) -> np.ndarray:
+        """Fake probability of the cheap-stage decisions on the model's scale (0 for other rows)"""
+        probabilities = np.zeros(len(stages))
+        probabilities[stages == 'cheap_fake'] = self.decision_confidence
+        probabilities[stages == 'cheap_genuine'] = 1 - self.decision_confidence
+        return probabilities
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = sum(self.stage_counts.values())
+        return {
+            'genuine_threshold': self.genuine_threshold,
+            'fake_threshold': self.fake_threshold,
+            'decision_confidence': self.decision_confidence,
+            'reviews': total,
+            'stage_counts': dict(self.stage_counts),
+            'hit_rates': {
+                stage: count / total if total else 0.0
+                for stage, count in self.stage_counts.items()
+            },
+        }
@@ -0,0 +1,348 @@
+"""
+declarativeNetRequest rule compiler.
+Compiles the blocklist into the extension's static rule files. Each rule blocks up to
+--domains-per-rule domains through condition.requestDomains (which also covers their subdomains),
+so subdomains of blocked parents are dropped. Rule ids are stable across builds: the previous
+rule files are read back, domains keep their rule, and only rules whose domains changed are
+rewritten.
+
+The changes are also written to malicious-sites-changes.json, so extensions still running the
+release's rule files can apply them before the next release. Dynamic rules cannot remove static
+ones, so the file holds:
+    updateStaticRules   options of chrome.declarativeNetRequest.updateStaticRules per ruleset,
+                        disabling the release's static rules that changed or were removed (and
+                        re-enabling ones an earlier changes file disabled)
+    updateDynamicRules  options of chrome.declarativeNetRequest.updateDynamicRules adding the new
+                        content of changed and added rules under their rule ids (and removing
+                        dynamic rules a previous changes file added under those ids)
+The changes are relative to the release: --baseline names the rule files of the shipped release,
+otherwise the previous changes file is carried forward and the file is left as it is when no rule
+changed. The build fails when the changes exceed Chrome's limits for runtime updates. An extension
+installing a release with the new rule files should re-enable its static rules and drop its
+dynamic rules.
+
+Usage (from the backend directory):
+    python -m app.dnr_rules ../browser-extension/rules [--feed SPEC ...] [--baseline DIR] [--manifest ../browser-extension/manifest.json]
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+
+from .blocklist import BlocklistIndex
+from .feeds import BLOCKLIST_FEEDS, ingest_feeds
+
+logger = logging.getLogger(__name__)
+
+# Chrome limits (chrome.declarativeNetRequest constants)
+GUARANTEED_MINIMUM_STATIC_RULES = 30000
+MAX_NUMBER_OF_ENABLED_STATIC_RULESETS = 50
+MAX_NUMBER_OF_DYNAMIC_RULES = 30000
+MAX_NUMBER_OF_DISABLED_STATIC_RULES = 5000
+
+DOMAINS_PER_RULE = int(os.getenv('FAKEBUSTER_DNR_DOMAINS_PER_RULE', '1000'))
+RULES_PER_RULESET = int(os.getenv('FAKEBUSTER_DNR_RULES_PER_RULESET', '5000'))
+
+RULESET_ID = 'malicious_sites'
+RULESET_FILE = 'malicious-sites.json'
+CHANGES_FILE = 'malicious-sites-changes.json'
+_SHARD_FILE_PATTERN = re.compile(r'malicious-sites(?:-(\d+))?\.json$')
+
+
+class RuleLimitError(Exception):
+    """Raised when the compiled rules do not fit Chrome's rule limits"""
+
+
+def ruleset_file(shard: int) -> str:
+    return RULESET_FILE if shard == 0 else f"malicious-sites-{shard + 1}.json"
+
+
+def ruleset_id(shard: int) -> str:
+    return RULESET_ID if shard == 0 else f"{RULESET_ID}_{shard + 1}"
+
+
+def make_rule(rule_id: int, domains: Sequence[str]) -> Dict[str, Any]:
+    return {
+        'id': rule_id,
+        'priority': 1,
+        'action': {'type': 'block'},
+        'condition': {
+            'requestDomains': sorted(domains),
+            'resourceTypes': ['main_frame'],
+        },
+    }
+
+
+def collapse_subdomains(index: BlocklistIndex) -> List[str]:
+    """Blocked domains that are not subdomains of another blocked domain"""
+    domains = list(index)
+    parents = [domain.split('.', 1)[1] if '.' in domain else '' for domain in domains]
+    has_blocked_parent = index.match_many([parent for parent in parents if parent])
+    blocked = iter(has_blocked_parent)
+    return [
+        domain for domain, parent in zip(domains, parents)
+        if not parent or next(blocked) is None
+    ]
+
+
+def read_rules(rules_dir: str) -> Tuple[Dict[int, List[str]], Dict[int, str]]:
+    """Domains and ruleset id of every rule in the rule files of a previous build, by rule id"""
+    rules: Dict[int, List[str]] = {}
+    rulesets: Dict[int, str] = {}
+    for path in glob.glob(os.path.join(rules_dir, 'malicious-sites*.json')):
+        match = _SHARD_FILE_PATTERN.search(os.path.basename(path))
+        if not match:
+            continue
+        shard = int(match.group(1)) - 1 if match.group(1) else 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for rule in json.load(f):
+                # Rules this compiler did not write (e.g. urlFilter rules) are replaced
+                rules[rule['id']] = list(rule.get('condition', {}).get('requestDomains', []))
+                rulesets[rule['id']] = ruleset_id(shard)
+    return rules, rulesets
+
+
+def read_changes(rules_dir: str) -> Tuple[Dict[int, str], Set[int]]:
+    """
+    Static rules disabled (rule id -> ruleset id) and all rule ids touched by the changes file
+    of a previous build
+    """
+    try:
+        with open(os.path.join(rules_dir, CHANGES_FILE), 'r', encoding='utf-8') as f:
+            changes = json.load(f)
+    except FileNotFoundError:
+        return {}, set()
+
+    disabled = {
+        rule_id: update['rulesetId']
+        for update in changes.get('updateStaticRules', [])
+        for rule_id in update.get('disableRuleIds', [])
+    }
+    # Files written before updateStaticRules existed hold the dynamic rule options at the top level
+    dynamic = changes.get('updateDynamicRules', changes)
+    touched = set(disabled) | set(dynamic.get('removeRuleIds', []))
+    touched.update(rule['id'] for rule in dynamic.get('addRules', []))
+    return disabled, touched
+
+
+def assign_rules(
+    previous: Dict[int, List[str]],
+    domains: Sequence[str],
+    domains_per_rule: int = DOMAINS_PER_RULE,
+) -> Tuple[Dict[int, List[str]], Set[int]]:
+    """
+    New rule id -> domains, and the ids of rules that changed (added, modified or removed).
+    Domains stay in their previous rule; new domains fill free space in existing rules first.
+    """
+    targets = set(domains)
+    rules: Dict[int, List[str]] = {}
+    changed: Set[int] = set()
+    placed: Set[str] = set()
+
+    for rule_id, rule_domains in sorted(previous.items()):
+        kept = [domain for domain in rule_domains if domain in targets and domain not in placed]
+        placed.update(kept)
+        if not kept or len(kept) != len(rule_domains):
+            changed.add(rule_id)
+        if kept:
+            rules[rule_id] = kept
+
+    new_domains = sorted(targets - placed)
+    free_ids = sorted(set(range(1, max(previous, default=0) + 1)) - set(rules))
+    next_id = max(previous, default=0) + 1
+    open_rules = [rule_id for rule_id in sorted(rules) if len(rules[rule_id]) < domains_per_rule]
+
+    position = 0
+    while position < len(new_domains):
+        if open_rules:
+            rule_id = open_rules.pop(0)
+        elif free_ids:
+            rule_id = free_ids.pop(0)
+            rules[rule_id] = []
+        else:
+            rule_id = next_id
+            next_id += 1
+            rules[rule_id] = []
+        space = domains_per_rule - len(rules[rule_id])
+        rules[rule_id].extend(new_domains[position:position + space])
+        position += space
+        changed.add(rule_id)
+
+    return rules, changed
+
+
+def _write_if_changed(path: str, content: str) -> bool:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def update_manifest(manifest_path: str, shards: int):
+    """Point the manifest's rule_resources at the compiled rule files"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    resources = manifest.setdefault('declarative_net_request', {}).setdefault('rule_resources', [])
+    # Entries for other rulesets are kept as they are
+    resources[:] = [
+        resource for resource in resources
+        if not _SHARD_FILE_PATTERN.search(os.path.basename(resource.get('path', '')))
+    ] + [
+        {'id': ruleset_id(shard), 'enabled': True, 'path': f"rules/{ruleset_file(shard)}"}
+        for shard in range(shards)
+    ]
+    _write_if_changed(manifest_path, json.dumps(manifest, indent=2) + '\n')
+
+
+def compile_rules(
+    index: BlocklistIndex,
+    rules_dir: str,
+    domains_per_rule: int = DOMAINS_PER_RULE,
+    rules_per_ruleset: int = RULES_PER_RULESET,
+    manifest_path: Optional[str] = None,
+    baseline_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Compile the index into rule files in rules_dir, rewriting only the files that changed.
+    baseline_dir holds the rule files of the shipped release the runtime changes are relative to.
+    """
+    previous, previous_rulesets = read_rules(rules_dir)
+    domains = collapse_subdomains(index)
+    rules, changed = assign_rules(previous, domains, domains_per_rule)
+
+    # Rule ids decide the shard, so a rule never moves between files
+    shards = (max(rules, default=0) - 1) // rules_per_ruleset + 1 if rules else 1
+    if len(rules) > GUARANTEED_MINIMUM_STATIC_RULES or shards > MAX_NUMBER_OF_ENABLED_STATIC_RULESETS:
+        raise RuleLimitError(
+            f"{len(rules)} rules in {shards} rulesets exceed Chrome's static rule limits; "
+            f"raise --domains-per-rule or --rules-per-ruleset"
+        )
+
+    # Changes relative to the release installed extensions run, checked before anything is written
+    prior_disabled, prior_touched = read_changes(rules_dir)
+    if baseline_dir is not None:
+        baseline, baseline_rulesets = read_rules(baseline_dir)
+        pending = {
+            rule_id for rule_id in set(baseline) | set(rules)
+            if set(baseline.get(rule_id, ())) != set(rules.get(rule_id, ()))
+        }
+        disabled = {rule_id: baseline_rulesets[rule_id] for rule_id in pending if rule_id in baseline}
+    elif not previous:
+        # A first build is the release itself
+        pending, disabled = set(), {}
+    else:
+        # Rules an earlier changes file touched still differ from the release; of the others,
+        # those in the previous rule files shipped with the release unchanged
+        pending = prior_touched | changed
+        disabled = dict(prior_disabled)
+        for rule_id in changed - prior_touched:
+            if rule_id in previous:
+                disabled[rule_id] = previous_rulesets[rule_id]
+    enabled = {rule_id: rule_set for rule_id, rule_set in prior_disabled.items() if rule_id not in disabled}
+
+    added = [make_rule(rule_id, rules[rule_id]) for rule_id in sorted(pending) if rule_id in rules]
+    if len(disabled) > MAX_NUMBER_OF_DISABLED_STATIC_RULES or len(added) > MAX_NUMBER_OF_DYNAMIC_RULES:
+        raise RuleLimitError(
+            f"{len(disabled)} disabled and {len(added)} added rules exceed Chrome's limits for runtime "
+            f"updates; ship a new release and pass its rules as --baseline"
+        )
+
+    os.makedirs(rules_dir, exist_ok=True)
+    shard_rules: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+    for rule_id in sorted(rules):
+        shard_rules[(rule_id - 1) // rules_per_ruleset].append(make_rule(rule_id, rules[rule_id]))
+
+    written = []
+    for shard, shard_content in enumerate(shard_rules):
+        path = os.path.join(rules_dir, ruleset_file(shard))
+        if _write_if_changed(path, json.dumps(shard_content, indent=2) + '\n'):
+            written.append(path)
+    for path in glob.glob(os.path.join(rules_dir, 'malicious-sites-*.json')):
+        match = _SHARD_FILE_PATTERN.search(os.path.basename(path))
+        if match and match.group(1) and int(match.group(1)) > shards:
+            os.remove(path)
+            written.append(path)
+
+    # Static rules are disabled in the ruleset that shipped them and replaced by dynamic rules;
+    # updateDynamicRules applies removals first, so reapplying is harmless
+    rule_sets = sorted(set(disabled.values()) | set(enabled.values()))
+    changes = {
+        'version': index.version,
+        'updateStaticRules': [
+            {
+                'rulesetId': rule_set,
+                'disableRuleIds': sorted(rule_id for rule_id, owner in disabled.items() if owner == rule_set),
+                'enableRuleIds': sorted(rule_id for rule_id, owner in enabled.items() if owner == rule_set),
+            }
+            for rule_set in rule_sets
+        ],
+        'updateDynamicRules': {
+            'removeRuleIds': sorted(pending | prior_touched),
+            'addRules': added,
+        },
+    }
+    changes_path = os.path.join(rules_dir, CHANGES_FILE)
+    if changed or baseline_dir is not None or not os.path.exists(changes_path):
+        if _write_if_changed(changes_path, json.dumps(changes, indent=2) + '\n'):
+            written.append(changes_path)
+
+    if manifest_path:
+        update_manifest(manifest_path, shards)
+
+    return {
+        'version': index.version,
+        'blocked_domains': len(index),
+        'rule_domains': len(domains),
+        'collapsed_subdomains': len(index) - len(domains),
+        'rules': len(rules),
+        'rulesets': shards,
+        'changed_rules': len(changed),
+        'runtime_disabled_rules': len(disabled),
+        'runtime_added_rules': len(added),
+        'files_written': written,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the blocklist into declarativeNetRequest rule files")
+    parser.add_argument('rules_dir', help="directory of the extension's rule files")
+    parser.add_argument('--feed', action='append', help="feed to compile (repeatable; default: FAKEBUSTER_BLOCKLIST_FEEDS)")
+    parser.add_argument('--domains-per-rule', type=int, default=DOMAINS_PER_RULE)
+    parser.add_argument('--rules-per-ruleset', type=int, default=RULES_PER_RULESET)
+    parser.add_argument('--baseline', help="rule files of the shipped release the runtime changes are relative to")
+    parser.add_argument('--manifest', help="extension manifest.json to update with the rule files")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    feeds = args.feed if args.feed is not None else [spec.strip() for spec in BLOCKLIST_FEEDS.split(',') if spec.strip()]
+    try:
+        index, _ = ingest_feeds(feeds)
+        report = compile_rules(
+            index, args.rules_dir,
+            domains_per_rule=max(1, args.domains_per_rule),
+            rules_per_ruleset=max(1, args.rules_per_ruleset),
+            manifest_path=args.manifest,
+            baseline_dir=args.baseline,
+        )
+    except (RuleLimitError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Compact membership filter of the blocklist for client-side checks.
+A Bloom filter over the blocked domains is exported as a versioned binary blob; clients test a
+host and its parent domains locally and confirm only filter hits with /security/lookup.
+
+Blob layout (little-endian):
+    4s   magic b'FBBF'
+    B    format version (1)
+    B    number of hash functions k
+    H    reserved (0)
+    Q    number of bits m
+    Q    number of domains n
+    16s  blocklist version (ASCII)
+    ...  m bits, bit j at byte j // 8, bit j % 8 (least significant first)
+
+A normalized domain d sets bits (h1 + i * h2) mod 2^64 mod m for i < k, where h1 and h2 are the
+first and second little-endian 64-bit words of SHA-256(d) and h2 is forced odd. SHA-256 is used
+so clients can hash with WebCrypto.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import functools
+import hashlib
+import math
+import os
+import struct
+
+import numpy as np
+
+from .blocklist import BlocklistIndex, host_suffixes
+
+MIN_FP_RATE = 1e-6
+MAX_FP_RATE = 0.5
+
+# Default target false-positive rate of exported filters
+FILTER_FP_RATE = float(os.getenv('FAKEBUSTER_BLOCKLIST_FILTER_FP_RATE', '0.001'))
+if not MIN_FP_RATE <= FILTER_FP_RATE <= MAX_FP_RATE:
+    raise ValueError(f"FAKEBUSTER_BLOCKLIST_FILTER_FP_RATE must be between {MIN_FP_RATE} and {MAX_FP_RATE}")
+# Rates clients may request: a fixed set, so every blob of a version is built at most once
+FILTER_FP_RATES = tuple(sorted({0.01, 0.001, 0.0001, FILTER_FP_RATE}, reverse=True))
+
+FILTER_MAGIC = b'FBBF'
+FILTER_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sBBHQQ16s')
+
+
+class FilterFormatError(ValueError):
+    """Raised for blobs that are not filters of this format"""
+
+
+def filter_parameters(count: int, fp_rate: float) -> Tuple[int, int]:
+    """(bits, hash functions) of the smallest Bloom filter meeting fp_rate for count domains"""
+    fp_rate = min(max(fp_rate, MIN_FP_RATE), MAX_FP_RATE)
+    count = max(count, 1)
+    num_bits = math.ceil(-count * math.log(fp_rate) / math.log(2) ** 2)
+    # Whole 64-bit words, so clients can read the bit array in any word size
+    num_bits = max(64, -(-num_bits // 64) * 64)
+    num_hashes = min(32, max(1, round(num_bits / count * math.log(2))))
+    return num_bits, num_hashes
+
+
+def _hash_pairs(domains: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    digests = b''.join(hashlib.sha256(domain.encode('ascii')).digest()[:16] for domain in domains)
+    words = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+    return words[:, 0].astype(np.uint64), words[:, 1] | np.uint64(1)
+
+
+class BloomFilter:
+    """Bloom filter over normalized domains with the bit layout of the exported blob"""
+
+    def __init__(self, bits: np.ndarray, num_bits: int, num_hashes: int, count: int, version: str):
+        self.bits = bits
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.version = version
+
+    @classmethod
+    def build(cls, domains: Iterable[str], count: int, fp_rate: float, version: str) -> 'BloomFilter':
+        """Filter of count normalized domains sized for the target false-positive rate"""
+        num_bits, num_hashes = filter_parameters(count, fp_rate)
+        h1, h2 = _hash_pairs(domains)
+        flags = np.zeros(num_bits, dtype=bool)
+        modulus = np.uint64(num_bits)
+        for i in range(num_hashes):
+            # uint64 arithmetic wraps mod 2^64, as in the client implementations
+            flags[(h1 + np.uint64(i) * h2) % modulus] = True
+        bits = np.packbits(flags, bitorder='little')
+        return cls(bits, num_bits, num_hashes, len(h1), version)
+
+    def might_contain(self, domain: str) -> bool:
+        """False if the normalized domain is certainly not in the filter"""
+        h1, h2 = _hash_pairs([domain])
+        positions = (h1[0] + np.arange(self.num_hashes, dtype=np.uint64) * h2[0]) % np.uint64(self.num_bits)
+        return bool(np.all(self.bits[positions >> np.uint64(3)] & (1 << (positions & np.uint64(7))).astype(np.uint8)))
+
+    def might_block(self, host: str) -> List[str]:
+        """Suffixes of a normalized host that hit the filter; these need an exact lookup"""
+        return [suffix for suffix in host_suffixes(host) if self.might_contain(suffix)]
+
+    def expected_fp_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            FILTER_MAGIC, FILTER_FORMAT_VERSION, self.num_hashes, 0,
+            self.num_bits, self.count, self.version.encode('ascii')[:16],
+        )
+        return header + self.bits.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'BloomFilter':
+        if len(blob) < _HEADER.size:
+            raise FilterFormatError("Blob is shorter than the filter header")
+        magic, format_version, num_hashes, _, num_bits, count, version = _HEADER.unpack_from(blob)
+        if magic != FILTER_MAGIC or format_version != FILTER_FORMAT_VERSION:
+            raise FilterFormatError("Not a version 1 blocklist filter")
+        bits = np.frombuffer(blob, dtype=np.uint8, offset=_HEADER.size)
+        if len(bits) * 8 != num_bits:
+            raise FilterFormatError(f"Expected {num_bits} bits, got {len(bits) * 8}")
+        return cls(bits, num_bits, num_hashes, count, version.rstrip(b'\0').decode('ascii'))
+
+
+class FilterExporter:
+    """Encoded filter blobs of the current blocklist version, built off the event loop"""
+
+    def __init__(self, max_blobs: int = len(FILTER_FP_RATES)):
+        self.max_blobs = max_blobs
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self.builds = 0
+        self.hits = 0
+
+    @staticmethod
+    def select_fp_rate(fp_rate: Optional[float] = None) -> float:
+        """The FILTER_FP_RATES tier requested (FILTER_FP_RATE by default); ValueError for any other rate"""
+        if fp_rate is None:
+            return FILTER_FP_RATE
+        for tier in FILTER_FP_RATES:
+            if math.isclose(fp_rate, tier, rel_tol=1e-9):
+                return tier
+        raise ValueError(f"fp_rate must be one of {', '.join(f'{tier:g}' for tier in FILTER_FP_RATES)}")
+
+    @staticmethod
+    def tag(index: BlocklistIndex, fp_rate: float) -> str:
+        return f"{index.version}-{fp_rate:g}"
+
+    async def get_blob(self, index: BlocklistIndex, fp_rate: float) -> bytes:
+        tag = self.tag(index, fp_rate)
+        blob = self._blobs.get(tag)
+        if blob is not None:
+            self.hits += 1
+            self._blobs.move_to_end(tag)
+            return blob
+
+        loop = asyncio.get_running_loop()
+        bloom = await loop.run_in_executor(
+            None, functools.partial(BloomFilter.build, index, len(index), fp_rate, index.version)
+        )
+        blob = bloom.to_bytes()
+        self.builds += 1
+        self._blobs[tag] = blob
+        while len(self._blobs) > self.max_blobs:
+            self._blobs.popitem(last=False)
+        return blob
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'blobs': len(self._blobs),
+            'bytes': sum(len(blob) for blob in self._blobs.values()),
+            'builds': self.builds,
+            'hits': self.hits,
+        }
@@ -0,0 +1,79 @@
+"""
+Executor pools for CPU-bound analysis work.
+Pure-Python feature work runs in a process pool; model calls, which release the GIL, run in a thread pool.
+"""
+
+from typing import Any, Callable, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import functools
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Executor kind for feature extraction and explanations: process, thread or inline
+FEATURE_EXECUTOR_KIND = os.getenv('FAKEBUSTER_FEATURE_EXECUTOR', 'process').lower()
+FEATURE_WORKERS = int(os.getenv('FAKEBUSTER_FEATURE_WORKERS', str(os.cpu_count() or 1)))
+
+# Executor kind for model inference: thread or inline
+MODEL_EXECUTOR_KIND = os.getenv('FAKEBUSTER_MODEL_EXECUTOR', 'thread').lower()
+MODEL_WORKERS = int(os.getenv('FAKEBUSTER_MODEL_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+_feature_executor: Optional[Executor] = None
+_model_executor: Optional[Executor] = None
+
+
+def _create_executor(kind: str, workers: int, name: str) -> Optional[Executor]:
+    workers = max(1, workers)
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"fakebuster-{name}")
+    if kind != 'inline':
+        logger.warning(f"Unknown executor kind '{kind}' for {name} work. Running inline.")
+    return None
+
+
+def get_feature_executor() -> Optional[Executor]:
+    """Executor for pure-Python feature work, or None to run inline"""
+    global _feature_executor
+    if _feature_executor is None and FEATURE_EXECUTOR_KIND != 'inline':
+        _feature_executor = _create_executor(FEATURE_EXECUTOR_KIND, FEATURE_WORKERS, 'features')
+    return _feature_executor
+
+
+def get_model_executor() -> Optional[Executor]:
+    """Executor for model inference, or None to run inline"""
+    global _model_executor
+    if _model_executor is None and MODEL_EXECUTOR_KIND != 'inline':
+        kind = 'thread' if MODEL_EXECUTOR_KIND == 'process' else MODEL_EXECUTOR_KIND
+        _model_executor = _create_executor(kind, MODEL_WORKERS, 'model')
+    return _model_executor
+
+
+async def _run_in(executor: Optional[Executor], func: Callable, *args, **kwargs) -> Any:
+    if executor is None:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_feature_task(func: Callable, *args, **kwargs) -> Any:
+    """Run feature extraction or explanation work off the event loop"""
+    return await _run_in(get_feature_executor(), func, *args, **kwargs)
+
+
+async def run_model_task(func: Callable, *args, **kwargs) -> Any:
+    """Run model inference off the event loop"""
+    return await _run_in(get_model_executor(), func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """Shut down the executor pools"""
+    global _feature_executor, _model_executor
+    for executor in (_feature_executor, _model_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _feature_executor = None
+    _model_executor = None
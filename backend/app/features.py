@@ -1,65 +1,242 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Union
+from collections import Counter
 import re
 import string
 import numpy as np
 
-def extract_features_for_xgboost(text: str) -> List[float]:
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+PUNCTUATION_CHARS = frozenset(string.punctuation)
+BASIC_PUNCTUATION_CHARS = frozenset('!.,?;:')
+
+# Column order of extract_features_for_xgboost / extract_feature_matrix
+FEATURE_NAMES = [
+    'text_length', 'word_count', 'avg_word_length', 'uppercase_ratio',
+    'digit_ratio', 'punctuation_ratio', 'exclamation_count', 'question_count',
+    'has_email', 'has_url',
+]
+
+# Character class bits used by the batch extractor
+CLASS_UPPER = 1
+CLASS_DIGIT = 2
+CLASS_PUNCTUATION = 4
+CLASS_SPACE = 8
+CLASS_EXCLAMATION = 16
+CLASS_QUESTION = 32
+
+
+class TextProfile:
+    """Single-pass profile of a review text shared by all feature extractors"""
+
+    __slots__ = (
+        'text', 'length', 'words', 'word_count', 'total_word_length',
+        'upper_count', 'digit_count', 'punctuation_count', 'basic_punctuation_count',
+        'exclamation_count', 'question_count', 'caps_words_count',
+        'has_email', 'has_url', '_lower',
+    )
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+
+        # Tokenize once
+        self.words = text.split()
+        self.word_count = len(self.words)
+        self.total_word_length = sum(map(len, self.words))
+        self.caps_words_count = sum(1 for word in self.words if len(word) > 1 and word.isupper())
+
+        # Count every character once, then classify the distinct characters
+        upper = digit = punct = basic_punct = 0
+        for char, count in Counter(text).items():
+            if char.isupper():
+                upper += count
+            elif char.isdigit():
+                digit += count
+            if char in PUNCTUATION_CHARS:
+                punct += count
+                if char in BASIC_PUNCTUATION_CHARS:
+                    basic_punct += count
+        self.upper_count = upper
+        self.digit_count = digit
+        self.punctuation_count = punct
+        self.basic_punctuation_count = basic_punct
+        self.exclamation_count = text.count('!')
+        self.question_count = text.count('?')
+
+        # Only run the regexes when their anchor characters are present
+        self.has_email = '@' in text and EMAIL_PATTERN.search(text) is not None
+        self.has_url = 'http' in text and URL_PATTERN.search(text) is not None
+        self._lower = None
+
+    @property
+    def lower(self) -> str:
+        """Lowercased text, computed on first use"""
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    def ratio(self, count: int) -> float:
+        return count / self.length if self.length else 0
+
+    @property
+    def avg_word_length(self) -> float:
+        return self.total_word_length / self.word_count if self.word_count else 0
+
+
+def get_text_profile(text: Union[str, TextProfile]) -> TextProfile:
+    """Return a TextProfile, reusing one that was already computed"""
+    if isinstance(text, TextProfile):
+        return text
+    return TextProfile(text)
+
+
+def extract_features_for_xgboost(text: Union[str, TextProfile]) -> List[float]:
     """Extract features for XGBoost model prediction"""
     # This function extracts features in the same format that the XGBoost model was trained on
-    
-    # Basic features for review text analysis
-    features = {
-        'text_length': len(text),
-        'word_count': len(text.split()),
-        'avg_word_length': sum(len(word) for word in text.split()) / len(text.split()) if text.split() else 0,
-        'uppercase_ratio': sum(1 for c in text if c.isupper()) / len(text) if text else 0,
-        'digit_ratio': sum(1 for c in text if c.isdigit()) / len(text) if text else 0,
-        'punctuation_ratio': sum(1 for c in text if c in string.punctuation) / len(text) if text else 0,
-        'exclamation_count': text.count('!'),
-        'question_count': text.count('?'),
-        'has_email': 1 if re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text) else 0,
-        'has_url': 1 if re.search(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text) else 0,
-    }
-    
+    profile = get_text_profile(text)
+
     # Convert to a numpy array or list in the correct order
     # This order must match the order used during training
     feature_array = [
-        features['text_length'],
-        features['word_count'],
-        features['avg_word_length'],
-        features['uppercase_ratio'],
-        features['digit_ratio'],
-        features['punctuation_ratio'],
-        features['exclamation_count'],
-        features['question_count'],
-        features['has_email'],
-        features['has_url']
+        profile.length,                                   # text_length
+        profile.word_count,                               # word_count
+        profile.avg_word_length,                          # avg_word_length
+        profile.ratio(profile.upper_count),               # uppercase_ratio
+        profile.ratio(profile.digit_count),               # digit_ratio
+        profile.ratio(profile.punctuation_count),         # punctuation_ratio
+        profile.exclamation_count,                        # exclamation_count
+        profile.question_count,                           # question_count
+        1 if profile.has_email else 0,                    # has_email
+        1 if profile.has_url else 0,                      # has_url
     ]
-    
+
     return feature_array
 
-def extract_additional_features(text: str) -> Dict[str, Any]:
+def extract_additional_features(text: Union[str, TextProfile]) -> Dict[str, Any]:
     """Extract additional features for display and explanation purposes"""
+    profile = get_text_profile(text)
     features = {
-        'text_length': len(text),
-        'word_count': len(text.split()),
-        'uppercase_ratio': sum(1 for c in text if c.isupper()) / len(text) if text else 0,
-        'exclamation_count': text.count('!'),
-        'question_count': text.count('?'),
-        'has_email': bool(re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text)),
-        'has_url': bool(re.search(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)),
-        'caps_words_count': sum(1 for word in text.split() if word.isupper() and len(word) > 1),
-        'digit_ratio': sum(1 for c in text if c.isdigit()) / len(text) if text else 0,
+        'text_length': profile.length,
+        'word_count': profile.word_count,
+        'uppercase_ratio': profile.ratio(profile.upper_count),
+        'exclamation_count': profile.exclamation_count,
+        'question_count': profile.question_count,
+        'has_email': profile.has_email,
+        'has_url': profile.has_url,
+        'caps_words_count': profile.caps_words_count,
+        'digit_ratio': profile.ratio(profile.digit_count),
     }
-    
+
     # Add sentiment-related features if TextBlob is available
     try:
         from textblob import TextBlob
-        blob = TextBlob(text)
+        blob = TextBlob(profile.text)
         features['sentiment_polarity'] = blob.sentiment.polarity
         features['sentiment_subjectivity'] = blob.sentiment.subjectivity
     except ImportError:
         features['sentiment_polarity'] = 0.0
         features['sentiment_subjectivity'] = 0.0
-    
+
     return features
+
+
+# ============================================================================
+# BATCH FEATURE EXTRACTION
+# ============================================================================
+
+_char_class_table = None
+
+def _classify_char(char: str) -> int:
+    flags = 0
+    if char.isupper():
+        flags |= CLASS_UPPER
+    if char.isdigit():
+        flags |= CLASS_DIGIT
+    if char in PUNCTUATION_CHARS:
+        flags |= CLASS_PUNCTUATION
+    if char.isspace():
+        flags |= CLASS_SPACE
+    if char == '!':
+        flags |= CLASS_EXCLAMATION
+    if char == '?':
+        flags |= CLASS_QUESTION
+    return flags
+
+def get_char_class_table() -> np.ndarray:
+    """Lookup table of character class bits for the Basic Multilingual Plane"""
+    global _char_class_table
+    if _char_class_table is None:
+        _char_class_table = np.fromiter(
+            (_classify_char(chr(code)) for code in range(0x10000)),
+            dtype=np.uint8,
+            count=0x10000,
+        )
+    return _char_class_table
+
+def _classify_codepoints(codes: np.ndarray) -> np.ndarray:
+    """Map code points to class bits, handling astral characters individually"""
+    table = get_char_class_table()
+    astral = codes >= 0x10000
+    if not astral.any():
+        return table[codes]
+
+    classes = table[np.where(astral, 0, codes)]
+    astral_codes, inverse = np.unique(codes[astral], return_inverse=True)
+    astral_classes = np.fromiter(
+        (_classify_char(chr(code)) for code in astral_codes),
+        dtype=np.uint8,
+        count=len(astral_codes),
+    )
+    classes[astral] = astral_classes[inverse]
+    return classes
+
+def extract_feature_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Extract XGBoost features for a batch of texts as a float32 (n_texts, n_features) matrix"""
+    n_texts = len(texts)
+    matrix = np.zeros((n_texts, len(FEATURE_NAMES)), dtype=np.float32)
+    if n_texts == 0:
+        return matrix
+
+    # Concatenate all texts into one code point buffer with per-text offsets
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n_texts)
+    starts = np.zeros(n_texts, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    buffer = ''.join(texts).encode('utf-32-le', 'surrogatepass')
+    codes = np.frombuffer(buffer, dtype=np.uint32)
+
+    if len(codes):
+        classes = _classify_codepoints(codes)
+        segment_ids = np.repeat(np.arange(n_texts), lengths)
+
+        def segment_count(mask: np.ndarray) -> np.ndarray:
+            return np.bincount(segment_ids, weights=mask, minlength=n_texts)
+
+        is_space = (classes & CLASS_SPACE) != 0
+        # A word starts at a non-space character preceded by whitespace or a text boundary
+        prev_space = np.empty_like(is_space)
+        prev_space[0] = True
+        prev_space[1:] = is_space[:-1]
+        prev_space[starts[lengths > 0]] = True
+
+        word_count = segment_count(~is_space & prev_space)
+        word_chars = segment_count(~is_space)
+        upper_count = segment_count((classes & CLASS_UPPER) != 0)
+        digit_count = segment_count((classes & CLASS_DIGIT) != 0)
+        punctuation_count = segment_count((classes & CLASS_PUNCTUATION) != 0)
+
+        safe_lengths = np.maximum(lengths, 1)
+        matrix[:, 1] = word_count
+        matrix[:, 2] = np.divide(word_chars, word_count, out=np.zeros(n_texts), where=word_count > 0)
+        matrix[:, 3] = upper_count / safe_lengths
+        matrix[:, 4] = digit_count / safe_lengths
+        matrix[:, 5] = punctuation_count / safe_lengths
+        matrix[:, 6] = segment_count((classes & CLASS_EXCLAMATION) != 0)
+        matrix[:, 7] = segment_count((classes & CLASS_QUESTION) != 0)
+
+    matrix[:, 0] = lengths
+    # Regexes only run on texts containing their anchor characters
+    matrix[:, 8] = [1 if '@' in text and EMAIL_PATTERN.search(text) else 0 for text in texts]
+    matrix[:, 9] = [1 if 'http' in text and URL_PATTERN.search(text) else 0 for text in texts]
+
+    return matrix
@@ -0,0 +1,381 @@
+"""
+Threat intelligence feed ingestion.
+Local feed files (hosts files, CSV, JSON lines) are stream-parsed into one blocklist index in a
+background thread; the new index is published atomically once complete, so lookups never see a
+partially built list. Feeds are polled and ingested again when they change.
+
+Feeds are parsed in a separate process (`python -m app.feeds`) into a snapshot file, so the GIL-bound parsing
+and its peak memory stay out of the serving processes. Snapshots are named after the feed files'
+sizes and modification times; a file lock makes one process ingest each state of the feeds while
+the others wait for it, and every process memory-maps the same snapshot. Under the gunicorn
+launcher (app.serve) the first ingestion happens in the master before workers fork.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import asyncio
+import contextlib
+import csv
+import glob
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no fork, so a single process serves and ingests
+    fcntl = None
+
+from .blocklist import BlocklistBuilder, BlocklistIndex, BlocklistStore, DEFAULT_MALICIOUS_DOMAINS
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated feed files, each optionally prefixed with its format ("csv:/data/feed.txt")
+BLOCKLIST_FEEDS = os.getenv('FAKEBUSTER_BLOCKLIST_FEEDS', os.getenv('FAKEBUSTER_BLOCKLIST_FILE', ''))
+# Seconds between checks of the feed files for changes (0 disables watching)
+BLOCKLIST_WATCH_INTERVAL = float(os.getenv('FAKEBUSTER_BLOCKLIST_WATCH_INTERVAL', '300'))
+# Directory of the ingested snapshots shared by the server's processes
+BLOCKLIST_SNAPSHOT_DIR = os.getenv(
+    'FAKEBUSTER_BLOCKLIST_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'fakebuster-blocklist')
+)
+
+FEED_FORMATS = ('hosts', 'csv', 'jsonl')
+# CSV columns and JSON fields holding the host, in order of preference
+HOST_FIELDS = ('domain', 'host', 'hostname', 'url')
+# Names that hosts files map to themselves; never blocked
+LOCAL_HOST_NAMES = frozenset((
+    'localhost', 'localhost.localdomain', 'local', 'broadcasthost',
+    'ip6-localhost', 'ip6-loopback', 'ip6-localnet', 'ip6-mcastprefix',
+    'ip6-allnodes', 'ip6-allrouters', 'ip6-allhosts', '0.0.0.0',
+))
+# Addresses hosts files usually point blocked names at (checked before parsing other addresses)
+SINK_ADDRESSES = frozenset(('0.0.0.0', '127.0.0.1', '::', '::1'))
+
+
+def parse_feed_spec(spec: str) -> Tuple[str, str]:
+    """(format, path) of a feed specification; the format defaults to the file suffix"""
+    spec = spec.strip()
+    prefix, _, rest = spec.partition(':')
+    if rest and prefix in FEED_FORMATS:
+        return prefix, rest
+    suffix = os.path.splitext(spec)[1].lower()
+    if suffix == '.csv':
+        return 'csv', spec
+    if suffix in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl', spec
+    return 'hosts', spec
+
+
+def _is_ip_address(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def iter_hosts_feed(path: str) -> Iterator[str]:
+    """Hosts of a hosts file ("0.0.0.0 example.com") or plain list, skipping '#' comments"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            tokens = line.split('#', 1)[0].split()
+            if not tokens:
+                continue
+            if len(tokens) > 1 and (tokens[0] in SINK_ADDRESSES or _is_ip_address(tokens[0])):
+                tokens = tokens[1:]
+            for token in tokens:
+                if token.lower() not in LOCAL_HOST_NAMES:
+                    yield token
+
+
+def iter_csv_feed(path: str) -> Iterator[str]:
+    """Hosts of a CSV feed: the first HOST_FIELDS column of its header, or the first column"""
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.reader(f)
+        column = 0
+        header_checked = False
+        for row in reader:
+            if not row or row[0].startswith('#'):
+                continue
+            if not header_checked:
+                # The first row that is not a comment may be a header
+                header_checked = True
+                header = [cell.strip().lower() for cell in row]
+                columns = [header.index(field) for field in HOST_FIELDS if field in header]
+                if columns:
+                    column = columns[0]
+                    continue
+            if column < len(row):
+                yield row[column]
+
+
+def iter_jsonl_feed(path: str) -> Iterator[Any]:
+    """Hosts of a JSON lines feed: bare strings or objects with a HOST_FIELDS field"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Counted as an invalid entry
+                yield None
+                continue
+            if isinstance(record, dict):
+                yield next((record[field] for field in HOST_FIELDS if record.get(field)), None)
+            else:
+                yield record
+
+
+FEED_READERS = {
+    'hosts': iter_hosts_feed,
+    'csv': iter_csv_feed,
+    'jsonl': iter_jsonl_feed,
+}
+
+
+def ingest_feeds(specs: Sequence[str], include_defaults: bool = True) -> Tuple[BlocklistIndex, Dict[str, Any]]:
+    """
+    Stream every feed into one index (normalized and deduplicated across feeds).
+    Returns the index and a report with per-feed counts.
+    """
+    builder = BlocklistBuilder()
+    if include_defaults:
+        builder.add_many(DEFAULT_MALICIOUS_DOMAINS)
+
+    start = time.perf_counter()
+    feeds: List[Dict[str, Any]] = []
+    for spec in specs:
+        feed_format, path = parse_feed_spec(spec)
+        accepted, invalid = builder.accepted, builder.invalid
+        feed_start = time.perf_counter()
+        builder.add_many(FEED_READERS[feed_format](path))
+        feeds.append({
+            'path': path,
+            'format': feed_format,
+            'entries': builder.accepted - accepted,
+            'invalid': builder.invalid - invalid,
+            'seconds': time.perf_counter() - feed_start,
+        })
+
+    index = builder.build()
+    report = {
+        'version': index.version,
+        'domains': len(index),
+        'entries': builder.accepted,
+        'invalid': builder.invalid,
+        'seconds': time.perf_counter() - start,
+        'feeds': feeds,
+    }
+    return index, report
+
+
+def _report_path(snapshot_path: str) -> str:
+    return os.path.splitext(snapshot_path)[0] + '.json'
+
+
+def ingest_to_snapshot(specs: Sequence[str], snapshot_path: str) -> Dict[str, Any]:
+    """Ingest the feeds and write the index and its report next to each other"""
+    index, report = ingest_feeds(specs)
+    report_path = _report_path(snapshot_path)
+    with open(f"{report_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(report, f)
+    os.replace(f"{report_path}.tmp", report_path)
+    # Written last: an existing snapshot is always complete
+    index.save(snapshot_path)
+    return report
+
+
+@contextlib.contextmanager
+def _snapshot_lock(snapshot_dir: str):
+    """Exclusive lock across the processes sharing a snapshot directory"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(snapshot_dir, 'ingest.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_ingestion_process(specs: Sequence[str], snapshot_path: str):
+    """Run ingest_to_snapshot in a new interpreter (not a fork: the caller may be running threads)"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (backend_dir, env.get('PYTHONPATH'))))
+    result = subprocess.run(
+        [sys.executable, '-m', 'app.feeds', snapshot_path, *specs],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        error = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"Feed ingestion exited with {result.returncode}")
+
+
+class BlocklistIngestor:
+    """Ingests the configured feeds in the background and publishes the result to a store"""
+
+    def __init__(self, store: BlocklistStore, feeds: Optional[Sequence[str]] = None, snapshot_dir: str = BLOCKLIST_SNAPSHOT_DIR):
+        if feeds is None:
+            feeds = [spec.strip() for spec in BLOCKLIST_FEEDS.split(',') if spec.strip()]
+        self.store = store
+        self.feeds = list(feeds)
+        self.snapshot_dir = snapshot_dir
+
+        self.ingest_count = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+        self._fingerprint: Optional[Tuple] = None
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def fingerprint(self) -> Tuple:
+        """Size and modification time of every feed file, used to detect updates"""
+        entries = []
+        for spec in self.feeds:
+            _, path = parse_feed_spec(spec)
+            try:
+                stat = os.stat(path)
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                entries.append((path, None, None))
+        return tuple(entries)
+
+    def snapshot_path(self, fingerprint: Tuple) -> str:
+        key = hashlib.sha256(repr((self.feeds, fingerprint)).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"blocklist-{key}.bin")
+
+    def load_or_ingest(self, fingerprint: Tuple, force: bool = False) -> Tuple[BlocklistIndex, Dict[str, Any]]:
+        """
+        Load the snapshot of the feeds' state, ingesting it first when no process has (blocking).
+        force ingests again even when the snapshot exists.
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self.snapshot_path(fingerprint)
+        with _snapshot_lock(self.snapshot_dir):
+            if force or not os.path.exists(path):
+                run_ingestion_process(self.feeds, path)
+                # Snapshots of earlier feed states are no longer loaded; processes that mapped
+                # them keep their mapping after the file is removed
+                for stale_path in glob.glob(os.path.join(self.snapshot_dir, 'blocklist-*')):
+                    if stale_path not in (path, _report_path(path)):
+                        os.remove(stale_path)
+            index = BlocklistIndex.load(path)
+            with open(_report_path(path), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        return index, report
+
+    @property
+    def ready(self) -> bool:
+        """False while feeds are configured but none were ingested yet (only the built-in list is loaded)"""
+        return not self.feeds or self.ingest_count > 0
+
+    def _record(self, fingerprint: Tuple, report: Dict[str, Any]):
+        self._fingerprint = fingerprint
+        self.last_error = None
+        self.last_report = report
+        self.ingest_count += 1
+        logger.info(f"Ingested {report['entries']} blocklist entries in {report['seconds']:.1f}s")
+
+    def preload(self):
+        """Ingest the feeds synchronously in a parent process before workers fork"""
+        if not self.feeds:
+            return
+        fingerprint = self.fingerprint()
+        try:
+            index, report = self.load_or_ingest(fingerprint)
+        except Exception as e:
+            # Workers retry in the background and report the list as not ready meanwhile
+            self.last_error = str(e)
+            logger.error(f"Error ingesting blocklist feeds: {e}")
+            return
+        self._record(fingerprint, report)
+        self.store.publish(index)
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Load (or ingest) the snapshot of the feeds off the event loop and publish the new index.
+        Returns True when a new version was published; a failed ingestion keeps the current list.
+        """
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+
+        async with self._reload_lock:
+            fingerprint = self.fingerprint()
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            loop = asyncio.get_running_loop()
+            try:
+                index, report = await loop.run_in_executor(None, self.load_or_ingest, fingerprint, force)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error ingesting blocklist feeds: {e}")
+                return False
+
+            self._record(fingerprint, report)
+            return self.store.publish(index)
+
+    async def _watch(self, interval: float):
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Blocklist reload failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = BLOCKLIST_WATCH_INTERVAL):
+        """Ingest the feeds now, in the background, then poll them for changes"""
+        if not self.feeds:
+            return
+        if self._watch_task is None or self._watch_task.done():
+            loop = asyncio.get_running_loop()
+            if interval > 0:
+                self._watch_task = loop.create_task(self._watch(interval))
+            else:
+                self._watch_task = loop.create_task(self.reload())
+
+    async def stop(self):
+        if self._watch_task is not None and not self._watch_task.done():
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+        self._watch_task = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'feeds': self.feeds,
+            'snapshot_dir': self.snapshot_dir,
+            'ingest_count': self.ingest_count,
+            'ready': self.ready,
+            'watching': self._watch_task is not None and not self._watch_task.done(),
+            'last_report': self.last_report,
+            'last_error': self.last_error,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest blocklist feeds into a snapshot file")
+    parser.add_argument('snapshot', help="snapshot file to write")
+    parser.add_argument('feeds', nargs='*', help="feed specifications ([format:]path)")
+    args = parser.parse_args(argv)
+
+    report = ingest_to_snapshot(args.feeds, args.snapshot)
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Batched review scoring engine.
+Scores a whole request as one feature matrix: extract all, predict once, post-process all.
+"""
+
+from typing import List, Dict, Any, Sequence, Optional
+import os
+import numpy as np
+
+from .features import TextProfile, extract_additional_features
+from .phrases import FALLBACK_REVIEW_MATCHER, PhraseMatcher
+
+# Maximum number of rows passed to a single predict_proba call
+MAX_BATCH_SIZE = int(os.getenv('FAKEBUSTER_MAX_BATCH_SIZE', '512'))
+
+# Probability above which the ML path flags a review as fake
+FAKE_THRESHOLD = 0.7
+
+# How much explanation work is done per review: none, basic or full
+EXPLAIN_LEVELS = ('none', 'basic', 'full')
+DEFAULT_EXPLAIN_LEVEL = 'basic'
+
+
+class FallbackReviewClassifier:
+    """
+    Rule-based review classifier used when the model files are missing.
+    Scores review texts directly (accepts_texts), not feature rows.
+    """
+
+    accepts_texts = True
+
+    def __init__(self, matcher: PhraseMatcher = FALLBACK_REVIEW_MATCHER):
+        self.matcher = matcher
+
+    def fake_probabilities(self, texts: Sequence[str]) -> np.ndarray:
+        # Distinct fake review phrases per text, normalized and capped at 90%
+        counts = self.matcher.count_many([text.lower() for text in texts])
+        return np.minimum(counts / 5.0, 0.9)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        proba = np.empty((len(texts), 2), dtype=np.float64)
+        proba[:, 1] = self.fake_probabilities(texts)
+        proba[:, 0] = 1.0 - proba[:, 1]
+        return proba
+
+
+def predict_fake_probabilities(model, feature_matrix: np.ndarray, batch_size: Optional[int] = None) -> np.ndarray:
+    """Return the fake probability for every row, calling predict_proba once per batch"""
+    batch_size = max(1, batch_size or MAX_BATCH_SIZE)
+    n_rows = len(feature_matrix)
+    probabilities = np.empty(n_rows, dtype=np.float64)
+
+    for start in range(0, n_rows, batch_size):
+        end = min(start + batch_size, n_rows)
+        pred = np.asarray(model.predict_proba(feature_matrix[start:end]))
+        probabilities[start:end] = pred[:, 1] if pred.shape[1] > 1 else pred[:, 0]
+
+    return probabilities
+
+
+def build_review_indicators(profile: TextProfile) -> List[str]:
+    """Generate human-readable indicators for a review"""
+    indicators = []
+
+    if profile.has_email:
+        indicators.append("Contains email address")
+    if profile.has_url:
+        indicators.append("Contains URL or link")
+    if profile.exclamation_count > 3:
+        indicators.append("Excessive exclamation marks")
+    if profile.ratio(profile.upper_count) > 0.3:
+        indicators.append("Excessive capitalization")
+
+    return indicators
+
+
+def build_review_analysis(
+    texts: Sequence[str],
+    feature_matrix: np.ndarray,
+    probabilities: np.ndarray,
+    explain: str = DEFAULT_EXPLAIN_LEVEL,
+    full_rows: Optional[Sequence[bool]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build the per-review analysis from already computed features and probabilities.
+
+    explain='none' skips indicators, 'basic' derives them from the text profile and
+    'full' also adds the TextBlob sentiment based explanation features, only to the
+    rows flagged in full_rows when it is given.
+    """
+    detailed_analysis = []
+    for i, (text, fake_probability) in enumerate(zip(texts, probabilities.tolist())):
+        analysis = {
+            'review_index': i,
+            'fake_probability': fake_probability,
+            'is_fake': fake_probability > FAKE_THRESHOLD,
+            'confidence': fake_probability if fake_probability > 0.5 else 1 - fake_probability,
+            'indicators': [],
+            'features': feature_matrix[i].tolist()
+        }
+
+        if explain != 'none':
+            profile = TextProfile(text)
+            analysis['indicators'] = build_review_indicators(profile)
+            if explain == 'full' and (full_rows is None or full_rows[i]):
+                analysis['explanation'] = extract_additional_features(profile)
+
+        detailed_analysis.append(analysis)
+
+    return detailed_analysis
@@ -3,24 +3,48 @@ FakeBuster FastAPI Backend
 A comprehensive API for detecting fake reviews, malicious websites, and finding valid coupons.
 """
 
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Literal, Callable
 import uvicorn
-import pickle
 import logging
 import asyncio
 import aiohttp
 import hashlib
+import json
 import re
 import os
+import secrets
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 
 # Local imports
-from .features import extract_features_for_xgboost
+from .features import (
+    TextProfile,
+    get_text_profile,
+    extract_feature_matrix,
+)
+from .inference import FallbackReviewClassifier, build_review_analysis, DEFAULT_EXPLAIN_LEVEL
+from .cache import LRUTTLCache, REVIEW_CACHE_SIZE, REVIEW_CACHE_TTL, review_cache_key
+from .page_index import PageReviewIndex, PageReviewSet, page_entry_key, PAGE_INDEX_SIZE, PAGE_INDEX_TTL, PAGE_MAX_REVIEWS
+from .scheduler import InferenceScheduler
+from .registry import ModelRegistry, ModelBundle
+from .executors import run_feature_task, shutdown_executors
+from .cascade import CASCADE_ENABLED, ReviewCascade, screen_reviews
+from .near_duplicates import NEAR_DUPLICATES_ENABLED, NearDuplicateIndex, minhash_signatures
+from .singleflight import SingleFlight, payload_key
+from .website_cache import DeepAnalysisLimiter, DEEP_ANALYSIS_WINDOW, DEEP_ANALYSIS_MAX_DOMAINS
+from .blocklist import MAX_LOOKUP_HOSTS, BlocklistIndex, BlocklistStore, DEFAULT_MALICIOUS_DOMAINS
+from .feeds import BlocklistIngestor
+from .domain_filter import FilterExporter
+from .phrases import (
+    REVIEW_PHRASE_MATCHER,
+    PAGE_SCAM_MATCHER,
+    TEXT_SCAM_MATCHER,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -67,16 +91,49 @@ app.add_middleware(
 
 # Security
 security = HTTPBearer()
+# Bearer token of the admin endpoints; they are disabled while it is unset
+ADMIN_TOKEN = os.getenv('FAKEBUSTER_ADMIN_TOKEN', '')
+
+# Reviews scored per step of the streaming review endpoint
+STREAM_CHUNK_SIZE = int(os.getenv('FAKEBUSTER_STREAM_CHUNK_SIZE', '32'))
 
 # Global variables for ML models
-review_model = None
-vectorizer = None
+# The review model and vectorizer live in model_registry (see ML MODEL LOADING)
 website_analyzer = None
 email_model = None
 
 # Firebase initialization
 db = None
 
+# Micro-batches concurrent review scoring into shared model calls
+inference_scheduler = InferenceScheduler(lambda: model_registry.current.review_model)
+
+# Per-review results keyed by review text and model version
+review_cache = LRUTTLCache(REVIEW_CACHE_SIZE, REVIEW_CACHE_TTL)
+
+# Reviews already scored per page URL, for incremental re-analysis
+page_review_index = PageReviewIndex(PAGE_INDEX_SIZE, PAGE_INDEX_TTL, PAGE_MAX_REVIEWS)
+
+# Cheap-first scoring: clear-cut reviews skip the model (FAKEBUSTER_CASCADE=1)
+review_cascade = ReviewCascade() if CASCADE_ENABLED else None
+
+# MinHash/LSH history of recent reviews for near-duplicate clusters
+near_duplicate_index = NearDuplicateIndex() if NEAR_DUPLICATES_ENABLED else None
+
+# Coalesces concurrent identical analysis requests into one computation
+request_flights = SingleFlight()
+
+# Deep website analysis runs at most once per domain per window
+deep_analysis_limiter = DeepAnalysisLimiter(DEEP_ANALYSIS_WINDOW, DEEP_ANALYSIS_MAX_DOMAINS)
+
+# Malicious domain blocklist; clients sync the changes between its published versions.
+# Starts with the built-in domains until the feeds (FAKEBUSTER_BLOCKLIST_FEEDS) are ingested
+blocklist_store = BlocklistStore(BlocklistIndex.build(DEFAULT_MALICIOUS_DOMAINS))
+blocklist_ingestor = BlocklistIngestor(blocklist_store)
+
+# Bloom filter blobs of the blocklist for local checks in clients
+blocklist_filters = FilterExporter()
+
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -87,13 +144,17 @@ class ReviewData(BaseModel):
     author: Optional[str] = None
     date: Optional[str] = None
 
+ExplainLevel = Literal['none', 'basic', 'full']
+
 class ReviewAnalysisRequest(BaseModel):
     reviews: List[ReviewData]
     url: HttpUrl
+    explain: ExplainLevel = DEFAULT_EXPLAIN_LEVEL
 
 class SingleReviewRequest(BaseModel):
     review_text: str
     url: HttpUrl
+    explain: ExplainLevel = DEFAULT_EXPLAIN_LEVEL
 
 class WebsiteAnalysisRequest(BaseModel):
     url: HttpUrl
@@ -133,6 +194,9 @@ class MaliciousReportRequest(BaseModel):
     reason: str
     reported_at: int
 
+class DomainLookupRequest(BaseModel):
+    hosts: List[str]
+
 # Response models
 class ReviewAnalysisResponse(BaseModel):
     fake_reviews: int
@@ -140,11 +204,15 @@ class ReviewAnalysisResponse(BaseModel):
     confidence: float
     fake_review_indicators: List[str]
     detailed_analysis: List[Dict[str, Any]]
+    model_version: Optional[str] = None
+    # Aggregate over every review seen for the URL, including earlier requests
+    page_summary: Optional[Dict[str, Any]] = None
 
 class SingleReviewResponse(BaseModel):
     is_fake_probability: float
     confidence: float
     indicators: List[str]
+    model_version: Optional[str] = None
 
 class WebsiteAnalysisResponse(BaseModel):
     trust_score: int
@@ -162,112 +230,85 @@ class CouponResponse(BaseModel):
 # ============================================================================
 
 async def load_models():
-    """Load machine learning models on startup"""
-    global review_model, vectorizer, website_analyzer, email_model
+    """Load machine learning models on startup and watch the models directory for new versions"""
+    global website_analyzer, email_model
     
-    # Skip model loading if ML libraries aren't available
-    if not ML_AVAILABLE:
-        logger.info("ML libraries not available. Using rule-based fallback only.")
-        review_model = None
-        vectorizer = None
-        website_analyzer = None
-        email_model = None
-        return
+    # If you have a separate website analysis model, load it here
+    # with open('models/website_analyzer.pkl', 'rb') as f:
+    #     website_analyzer = pickle.load(f)
     
-    try:
-        # Load XGBoost model for advanced review analysis
-        with open('models/xgboost_model.pkl', 'rb') as f:
-            review_model = pickle.load(f)
-        
-        # Load the preprocessed reviews data for comparison
-        with open('models/processed_reviews.pkl', 'rb') as f:
-            vectorizer = pickle.load(f)
-            
-        # If you have a separate website analysis model, load it here
-        # with open('models/website_analyzer.pkl', 'rb') as f:
-        #     website_analyzer = pickle.load(f)
-        
-        logger.info("ML models loaded successfully")
-        
-    except FileNotFoundError as e:
-        logger.warning(f"Model file not found: {e}. Using fallback algorithms.")
-        # Initialize fallback models if ML is available
-        if ML_AVAILABLE:
-            try:
-                review_model = FallbackReviewClassifier()
-                vectorizer = TfidfVectorizer(max_features=5000, stop_words='english')
-            except Exception as fallback_error:
-                logger.error(f"Failed to initialize fallback models: {fallback_error}")
-                review_model = None
-                vectorizer = None
-        else:
-            review_model = None
-            vectorizer = None
-        
-    except Exception as e:
-        logger.error(f"Error loading models: {e}")
-        raise
+    if model_registry.preloaded:
+        # Loaded by the parent process before fork (see app.serve); only compile and warm this worker's copy
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, model_registry.prepare_worker)
+    else:
+        await model_registry.reload(force=True)
+    logger.info(f"Review model ready: {model_registry.current.version}")
+    model_registry.start_watching()
 
-class FallbackReviewClassifier:
-    """Fallback classifier when ML model is not available"""
-    
-    def predict_proba(self, X):
-        # Simple rule-based fake review detection
-        fake_probs = []
-        
-        for text in X:
-            if isinstance(text, np.ndarray):
-                text = " ".join(map(str, text))
-            
-            fake_indicators = [
-                'amazing', 'perfect', 'best ever', 'life changing',
-                'highly recommend', 'must buy', 'incredible',
-                'outstanding', 'excellent quality', 'fast shipping'
-            ]
-            
-            # Simple scoring based on fake indicators
-            text_lower = str(text).lower()
-            fake_score = sum(1 for indicator in fake_indicators if indicator in text_lower)
-            
-            # Normalize score (0-1 probability)
-            fake_prob = min(fake_score / 5.0, 0.9)  # Cap at 90%
-            fake_probs.append([1 - fake_prob, fake_prob])
-        
-        return np.array(fake_probs)
+def create_fallback_models():
+    """Rule-based review model used when the model files are missing"""
+    return FallbackReviewClassifier(), TfidfVectorizer(max_features=5000, stop_words='english')
+
+# Current review model bundle, hot-reloaded when the model files change
+model_registry = ModelRegistry(fallback_factory=create_fallback_models, ml_available=ML_AVAILABLE)
+
+def preload_models():
+    """Load models and the blocklist in the parent process so forked workers share one copy (see app.serve)"""
+    model_registry.preload()
+    blocklist_ingestor.preload()
 
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def extract_features_from_review(review: ReviewData) -> Dict[str, Any]:
+def extract_features_from_review(review: ReviewData, profile: Optional[TextProfile] = None) -> Dict[str, Any]:
     """Extract features from a review for analysis"""
-    text = review.text
+    profile = profile or get_text_profile(review.text)
+    text_lower = profile.lower
     
     features = {
-        'length': len(text),
-        'word_count': len(text.split()),
-        'exclamation_count': text.count('!'),
-        'caps_ratio': sum(1 for c in text if c.isupper()) / len(text) if text else 0,
-        'punctuation_ratio': sum(1 for c in text if c in '!.,?;:') / len(text) if text else 0,
-        'avg_word_length': np.mean([len(word) for word in text.split()]) if text.split() else 0,
+        'length': profile.length,
+        'word_count': profile.word_count,
+        'exclamation_count': profile.exclamation_count,
+        'caps_ratio': profile.ratio(profile.upper_count),
+        'punctuation_ratio': profile.ratio(profile.basic_punctuation_count),
+        'avg_word_length': profile.avg_word_length,
     }
     
-    # Sentiment indicators
-    positive_words = ['amazing', 'excellent', 'perfect', 'outstanding', 'incredible']
-    negative_words = ['terrible', 'awful', 'horrible', 'worst', 'disappointing']
-    
-    features['positive_word_count'] = sum(1 for word in positive_words if word in text.lower())
-    features['negative_word_count'] = sum(1 for word in negative_words if word in text.lower())
+    # Sentiment and fake review phrase counts from one matcher call
+    phrase_counts = REVIEW_PHRASE_MATCHER.count_by_category(text_lower)
+    features['positive_word_count'] = phrase_counts.get('positive', 0)
+    features['negative_word_count'] = phrase_counts.get('negative', 0)
+    features['fake_indicator_count'] = phrase_counts.get('fake_indicator', 0)
     
-    # Fake review indicators
-    fake_indicators = [
-        'life changing', 'best purchase ever', 'highly recommend',
-        'must buy', 'changed my life', 'amazing quality'
-    ]
+    return features
+
+def analyze_review_with_rules(review_index: int, review: ReviewData, explain: str = DEFAULT_EXPLAIN_LEVEL) -> Dict[str, Any]:
+    """Rule-based review analysis used when ML libraries are not available"""
+    features = extract_features_from_review(review)
+    fake_probability = min(features['fake_indicator_count'] * 0.2, 0.9)
+    is_fake = fake_probability > 0.5
     
-    features['fake_indicator_count'] = sum(1 for indicator in fake_indicators if indicator in text.lower())
+    indicators = []
+    if explain != 'none':
+        if features['fake_indicator_count'] > 2:
+            indicators.append("Contains multiple fake review phrases")
+        if features['caps_ratio'] > 0.3:
+            indicators.append("Excessive capitalization")
+        if features['exclamation_count'] > 3:
+            indicators.append("Excessive exclamation marks")
+        if features['positive_word_count'] > 5:
+            indicators.append("Unnaturally positive language")
     
-    return features
+    return {
+        'review_index': review_index,
+        'fake_probability': float(fake_probability),
+        'is_fake': is_fake,
+        'confidence': float(fake_probability if fake_probability > 0.5 else 1 - fake_probability),
+        'indicators': indicators,
+        'features': features
+    }
 
 def calculate_website_trust_score(analysis_data: Dict[str, Any]) -> int:
     """Calculate trust score based on website analysis"""
@@ -352,6 +393,129 @@ def analyze_website_legitimacy(data: Dict[str, Any]) -> Dict[str, Any]:
         'risk_level': risk_level
     }
 
+# ============================================================================
+# REVIEW SCORING PIPELINE
+# ============================================================================
+
+async def predict_review_probabilities(model, texts: List[str], feature_matrix: np.ndarray) -> np.ndarray:
+    """Fake probability per review from the bundle's review model"""
+    if getattr(model, 'accepts_texts', False):
+        # The rule-based fallback scores the texts themselves, in one vectorized pass
+        return model.predict_proba(texts)[:, 1]
+    return await inference_scheduler.predict(feature_matrix, model)
+
+async def score_review_texts(
+    review_texts: List[str],
+    page_url: Optional[str] = None,
+    explain: str = DEFAULT_EXPLAIN_LEVEL,
+    bundle: Optional[ModelBundle] = None,
+    occurrences: Optional[Dict[str, int]] = None,
+    cluster_ids: Optional[List[Optional[str]]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[PageReviewSet]]:
+    """
+    Score review texts with the loaded model, only scoring reviews not seen before.
+    When a page URL is given, results are merged into that page's review set, and reviews the
+    page already scored reuse their probability instead of running the model again.
+    occurrences counts the texts of the same request already scored, and cluster_ids gives the
+    duplicate clusters computed over the whole request (for chunked requests).
+    """
+    # One model bundle is used for the whole request, even if a reload happens meanwhile
+    bundle = bundle or model_registry.current
+    model_version = bundle.version
+    review_keys = [review_cache_key(text, model_version) for text in review_texts]
+    # Cached results depend on how much explanation was computed for them
+    cache_keys = [f"{key}:{explain}" for key in review_keys]
+    results: List[Optional[Dict[str, Any]]] = [review_cache.get(key) for key in cache_keys]
+    
+    # Identical texts on a page are counted once per copy: copies are told apart by occurrence
+    page = None
+    entry_keys: List[bytes] = []
+    if page_url:
+        occurrences = {} if occurrences is None else occurrences
+        page = page_review_index.get_page(page_url, model_version)
+        for text, key in zip(review_texts, review_keys):
+            occurrence = occurrences.get(text, 0)
+            occurrences[text] = occurrence + 1
+            entry_keys.append(page_entry_key(key, occurrence))
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        missing_texts = [review_texts[i] for i in missing]
+        # Probabilities the page already holds (evicted from review_cache, or another explain level)
+        page_probabilities = [page.get(entry_keys[i]) if page is not None else None for i in missing]
+        new_rows = np.array([probability is None for probability in page_probabilities], dtype=bool)
+        
+        stages = None
+        full_rows = None
+        if review_cascade is not None:
+            # Cheap stage first; only uncertain reviews reach the model and the full explanation
+            feature_matrix, cheap_scores = await run_feature_task(screen_reviews, missing_texts)
+            stages = review_cascade.stages(cheap_scores, new_rows)
+            probabilities = review_cascade.decision_probabilities(stages)
+            full_rows = (stages == 'model') | ~new_rows
+            model_rows = np.flatnonzero(stages == 'model')
+        else:
+            feature_matrix = await run_feature_task(extract_feature_matrix, missing_texts)
+            probabilities = np.zeros(len(missing_texts))
+            model_rows = np.flatnonzero(new_rows)
+        if len(model_rows):
+            probabilities[model_rows] = await predict_review_probabilities(
+                bundle.review_model, [missing_texts[i] for i in model_rows], feature_matrix[model_rows]
+            )
+        for row, probability in enumerate(page_probabilities):
+            if probability is not None:
+                probabilities[row] = probability
+        
+        if explain == 'none':
+            scored = build_review_analysis(missing_texts, feature_matrix, probabilities, explain)
+        else:
+            # Explanation work runs in the feature executor pool
+            scored = await run_feature_task(build_review_analysis, missing_texts, feature_matrix, probabilities, explain, full_rows)
+        
+        if stages is not None:
+            for analysis, stage, cheap_score in zip(scored, stages, cheap_scores.tolist()):
+                analysis['stage'] = stage
+                analysis['cheap_score'] = cheap_score
+        
+        for i, analysis in zip(missing, scored):
+            analysis.pop('review_index', None)
+            review_cache.put(cache_keys[i], analysis)
+            results[i] = analysis
+    
+    # Merge into the page aggregate; reviews already counted for the page are skipped
+    if page is not None:
+        for entry_key, result in zip(entry_keys, results):
+            page_review_index.add(page, entry_key, result['fake_probability'])
+    
+    detailed_analysis = [
+        {'review_index': i, **result}
+        for i, result in enumerate(results)
+    ]
+    
+    if near_duplicate_index is not None:
+        if cluster_ids is None:
+            cluster_ids = await find_duplicate_clusters(review_texts, page_url)
+        for analysis, cluster_id in zip(detailed_analysis, cluster_ids):
+            analysis['duplicate_cluster'] = cluster_id
+    
+    return detailed_analysis, page
+
+async def find_duplicate_clusters(review_texts: List[str], page_url: Optional[str]) -> List[Optional[str]]:
+    """Near-duplicate cluster id per review, against this request and recently seen reviews"""
+    signatures = await run_feature_task(minhash_signatures, review_texts)
+    
+    # A page that is analyzed again yields the same keys, so re-sent reviews are not their own
+    # duplicates; repeated copies within one page are told apart by their occurrence number
+    page_key = PageReviewIndex.page_key(page_url) if page_url else ''
+    occurrences: Dict[str, int] = {}
+    keys = []
+    for text in review_texts:
+        occurrence = occurrences.get(text, 0)
+        occurrences[text] = occurrence + 1
+        keys.append((page_key, hash(text), occurrence))
+    
+    return near_duplicate_index.assign_clusters(keys, signatures)
+
 # ============================================================================
 # AUTHENTICATION
 # ============================================================================
@@ -365,6 +529,14 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Require the FAKEBUSTER_ADMIN_TOKEN bearer token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not secrets.compare_digest(credentials.credentials.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {"user_id": "admin"}
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -373,8 +545,17 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
 async def startup_event():
     """Initialize the application"""
     await load_models()
+    blocklist_ingestor.start()
     await init_firebase()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background workers"""
+    await model_registry.stop_watching()
+    await blocklist_ingestor.stop()
+    await inference_scheduler.close()
+    shutdown_executors()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -396,6 +577,14 @@ async def analyze_reviews(
     
     HERE IS WHERE YOUR .PKL MODEL IS INTEGRATED
     """
+    # Identical concurrent payloads (a trending product page) share one analysis
+    return await request_flights.do(
+        payload_key('analyze_reviews', request),
+        lambda: run_review_analysis(request, background_tasks)
+    )
+
+async def run_review_analysis(request: ReviewAnalysisRequest, background_tasks: BackgroundTasks):
+    """Review analysis behind /analyze/reviews"""
     try:
         reviews = request.reviews
         
@@ -403,85 +592,40 @@ async def analyze_reviews(
             raise HTTPException(status_code=400, detail="No reviews provided")
         
         fake_count = 0
+        total_reviews = len(reviews)
         detailed_analysis = []
+        model_version = None
+        page_summary = None
         
         # Check if ML libraries are available
         if not ML_AVAILABLE:
             # Fallback: Simple rule-based analysis
             for i, review in enumerate(reviews):
-                features = extract_features_from_review(review)
-                fake_probability = min(features['fake_indicator_count'] * 0.2, 0.9)
-                is_fake = fake_probability > 0.5
-                
-                if is_fake:
+                analysis = analyze_review_with_rules(i, review, request.explain)
+                if analysis['is_fake']:
                     fake_count += 1
-                
-                indicators = []
-                if features['fake_indicator_count'] > 2:
-                    indicators.append("Contains multiple fake review phrases")
-                if features['caps_ratio'] > 0.3:
-                    indicators.append("Excessive capitalization")
-                if features['exclamation_count'] > 3:
-                    indicators.append("Excessive exclamation marks")
-                if features['positive_word_count'] > 5:
-                    indicators.append("Unnaturally positive language")
-                
-                detailed_analysis.append({
-                    'review_index': i,
-                    'fake_probability': float(fake_probability),
-                    'is_fake': is_fake,
-                    'confidence': float(fake_probability if fake_probability > 0.5 else 1 - fake_probability),
-                    'indicators': indicators,
-                    'features': features
-                })
+                detailed_analysis.append(analysis)
             
             avg_confidence = sum([analysis['confidence'] for analysis in detailed_analysis]) / len(detailed_analysis)
         else:
             # ML-based analysis
             review_texts = [review.text for review in reviews]
             
-            if review_model:
+            bundle = model_registry.current
+            model_version = bundle.version
+            
+            if bundle.review_model:
                 # Process the reviews using the XGBoost model
                 try:
-                    # For XGBoost model that takes extracted features
-                    for i, review_text in enumerate(review_texts):
-                        # Extract features using our dedicated function
-                        features = extract_features_for_xgboost(review_text)
-                        
-                        # Get prediction probability from XGBoost model
-                        pred = review_model.predict_proba([features])[0]
-                        fake_probability = float(pred[1]) if len(pred) > 1 else float(pred[0])
-                        is_fake = fake_probability > 0.7
-                        
-                        if is_fake:
-                            fake_count += 1
-                        
-                        # Generate indicators based on features
-                        indicators = []
-                        review_features = extract_additional_features(review_text)
-                        
-                        if review_features.get('has_email', False):
-                            indicators.append("Contains email address")
-                        if review_features.get('has_url', False):
-                            indicators.append("Contains URL or link")
-                        if review_features.get('exclamation_count', 0) > 3:
-                            indicators.append("Excessive exclamation marks")
-                        if review_features.get('uppercase_ratio', 0) > 0.3:
-                            indicators.append("Excessive capitalization")
-                        
-                        confidence = float(fake_probability if fake_probability > 0.5 else 1 - fake_probability)
-                        
-                        detailed_analysis.append({
-                            'review_index': i,
-                            'fake_probability': fake_probability,
-                            'is_fake': is_fake,
-                            'confidence': confidence,
-                            'indicators': indicators,
-                            'features': features
-                        })
+                    # Extract all features, score them in one batched predict call and post-process
+                    # Only reviews not yet seen for this URL are scored
+                    detailed_analysis, page = await score_review_texts(
+                        review_texts, page_url=str(request.url), explain=request.explain, bundle=bundle
+                    )
                     
-                    # Calculate overall confidence
-                    avg_confidence = sum([analysis['confidence'] for analysis in detailed_analysis]) / len(detailed_analysis) if detailed_analysis else 0.0
+                    fake_count = sum(1 for analysis in detailed_analysis if analysis['is_fake'])
+                    avg_confidence = sum(analysis['confidence'] for analysis in detailed_analysis) / len(detailed_analysis)
+                    page_summary = page.summary()
                     
                 except Exception as e:
                     logger.error(f"Error processing reviews with ML model: {e}")
@@ -494,23 +638,94 @@ async def analyze_reviews(
                 raise HTTPException(status_code=500, detail="ML model not loaded")
         
         # Background task to log analysis
-        background_tasks.add_task(log_review_analysis, str(request.url), len(reviews), fake_count)
+        background_tasks.add_task(log_review_analysis, str(request.url), total_reviews, fake_count)
         
         return ReviewAnalysisResponse(
             fake_reviews=fake_count,
-            total_reviews=len(reviews),
+            total_reviews=total_reviews,
             confidence=float(avg_confidence),
             fake_review_indicators=[
                 indicator for analysis in detailed_analysis 
                 for indicator in analysis['indicators']
             ],
-            detailed_analysis=detailed_analysis
+            detailed_analysis=detailed_analysis,
+            model_version=model_version,
+            page_summary=page_summary
         )
         
     except Exception as e:
         logger.error(f"Review analysis error: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+@app.post("/api/v1/analyze/reviews/stream")
+async def analyze_reviews_stream(
+    request: ReviewAnalysisRequest,
+    user=Depends(verify_token)
+):
+    """
+    Analyze multiple reviews as a stream of NDJSON records
+    
+    One record is emitted per review as soon as it is scored, followed by a summary record.
+    """
+    reviews = request.reviews
+    url = str(request.url)
+    
+    if not reviews:
+        raise HTTPException(status_code=400, detail="No reviews provided")
+    bundle = model_registry.current
+    if ML_AVAILABLE and not bundle.review_model:
+        raise HTTPException(status_code=500, detail="ML model not loaded")
+    
+    async def generate_records():
+        fake_count = 0
+        confidence_sum = 0.0
+        page = None
+        occurrences: Dict[str, int] = {}
+        cluster_ids = None
+        
+        try:
+            if ML_AVAILABLE and near_duplicate_index is not None:
+                # Clusters span the whole request, so duplicates in different chunks are found
+                cluster_ids = await find_duplicate_clusters([review.text for review in reviews], url)
+            
+            # Score in small chunks so early reviews are sent while later ones are scored
+            for start in range(0, len(reviews), STREAM_CHUNK_SIZE):
+                chunk = reviews[start:start + STREAM_CHUNK_SIZE]
+                if ML_AVAILABLE:
+                    chunk_analysis, page = await score_review_texts(
+                        [review.text for review in chunk], page_url=url, explain=request.explain,
+                        bundle=bundle, occurrences=occurrences,
+                        cluster_ids=cluster_ids[start:start + STREAM_CHUNK_SIZE] if cluster_ids is not None else None
+                    )
+                else:
+                    chunk_analysis = [
+                        analyze_review_with_rules(i, review, request.explain) for i, review in enumerate(chunk)
+                    ]
+                
+                for analysis in chunk_analysis:
+                    analysis['review_index'] += start
+                    fake_count += 1 if analysis['is_fake'] else 0
+                    confidence_sum += analysis['confidence']
+                    yield json.dumps({'type': 'review', **analysis}) + "\n"
+            
+            total_reviews = len(reviews)
+            yield json.dumps({
+                'type': 'summary',
+                'fake_reviews': fake_count,
+                'total_reviews': total_reviews,
+                'confidence': float(confidence_sum / total_reviews),
+                'model_version': bundle.version if ML_AVAILABLE else None,
+                'page_summary': page.summary() if page is not None else None
+            }) + "\n"
+            
+            await log_review_analysis(url, total_reviews, fake_count)
+            
+        except Exception as e:
+            logger.error(f"Streaming review analysis error: {e}")
+            yield json.dumps({'type': 'error', 'error': 'Analysis failed'}) + "\n"
+    
+    return StreamingResponse(generate_records(), media_type="application/x-ndjson")
+
 @app.post("/api/v1/analyze/single-review", response_model=SingleReviewResponse)
 async def analyze_single_review(
     request: SingleReviewRequest,
@@ -521,31 +736,39 @@ async def analyze_single_review(
         review_data = ReviewData(text=request.review_text)
         
         # Use the XGBoost model for review analysis
-        if review_model:
-            # Prepare features for XGBoost model
-            features_array = extract_features_for_xgboost(request.review_text)
-            prediction = review_model.predict_proba([features_array])[0]
-            fake_probability = prediction[1] if len(prediction) > 1 else prediction[0]
+        bundle = model_registry.current
+        cached = None
+        if bundle.review_model:
+            cache_key = f"{review_cache_key(request.review_text, bundle.version)}:{DEFAULT_EXPLAIN_LEVEL}"
+            cached = review_cache.get(cache_key)
+        if cached is not None:
+            fake_probability = cached['fake_probability']
+        elif bundle.review_model:
+            # Score through the same batched engine as the review list endpoint
+            feature_matrix = extract_feature_matrix([request.review_text])
+            fake_probability = (await predict_review_probabilities(bundle.review_model, [request.review_text], feature_matrix))[0]
         else:
             # Fallback analysis
             fake_probability = 0.5
         
-        features = extract_features_from_review(review_data)
-        
         indicators = []
-        if features.get('fake_indicator_count', 0) > 1:
-            indicators.append("Contains fake review phrases")
-        if features.get('caps_ratio', 0) > 0.2:
-            indicators.append("Excessive capitalization")
-        if features.get('exclamation_count', 0) > 2:
-            indicators.append("Too many exclamation marks")
+        if request.explain != 'none':
+            features = extract_features_from_review(review_data)
+            
+            if features.get('fake_indicator_count', 0) > 1:
+                indicators.append("Contains fake review phrases")
+            if features.get('caps_ratio', 0) > 0.2:
+                indicators.append("Excessive capitalization")
+            if features.get('exclamation_count', 0) > 2:
+                indicators.append("Too many exclamation marks")
         
         confidence = max(fake_probability, 1 - fake_probability)
         
         return SingleReviewResponse(
             is_fake_probability=float(fake_probability),
             confidence=float(confidence),
-            indicators=indicators
+            indicators=indicators,
+            model_version=bundle.version if bundle.review_model else None
         )
         
     except Exception as e:
@@ -559,26 +782,38 @@ async def analyze_website(
     user=Depends(verify_token)
 ):
     """Analyze website legitimacy and safety"""
+    return await request_flights.do(
+        payload_key('analyze_website', request),
+        lambda: run_website_analysis(request, background_tasks)
+    )
+
+async def run_website_analysis(request: WebsiteAnalysisRequest, background_tasks: BackgroundTasks):
+    """Website analysis behind /analyze/website"""
     try:
-        # Combine local analysis with server-side checks
-        analysis_data = request.local_analysis or {}
-        analysis_data.update({
-            'url': str(request.url),
-            'domain': request.domain
-        })
-        
-        # Perform additional server-side analysis
-        background_tasks.add_task(perform_deep_website_analysis, str(request.url))
+        # Perform additional server-side analysis, at most once per domain per window
+        if deep_analysis_limiter.admit(request.domain):
+            background_tasks.add_task(perform_deep_website_analysis, str(request.url))
         
-        # Analyze legitimacy
-        legitimacy_result = analyze_website_legitimacy(analysis_data)
-        
-        return WebsiteAnalysisResponse(**legitimacy_result)
+        return await compute_website_analysis(request)
         
     except Exception as e:
         logger.error(f"Website analysis error: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+async def compute_website_analysis(request: WebsiteAnalysisRequest) -> WebsiteAnalysisResponse:
+    """Legitimacy analysis of a website from its submitted signals"""
+    # Combine local analysis with server-side checks
+    analysis_data = dict(request.local_analysis or {})
+    analysis_data.update({
+        'url': str(request.url),
+        'domain': request.domain
+    })
+    
+    # Analyze legitimacy
+    legitimacy_result = analyze_website_legitimacy(analysis_data)
+    
+    return WebsiteAnalysisResponse(**legitimacy_result)
+
 @app.post("/api/v1/analyze/page")
 async def analyze_page(
     request: PageAnalysisRequest,
@@ -586,47 +821,47 @@ async def analyze_page(
 ):
     """Comprehensive page analysis"""
     try:
-        analysis_data = request.dict()
-        legitimacy_result = analyze_website_legitimacy(analysis_data)
-        
-        # Add page-specific analysis
-        alerts = []
-        
-        # Check for scam indicators in page text
-        scam_keywords = [
-            'limited time offer', 'act now', 'exclusive deal',
-            'guaranteed income', 'work from home', 'make money fast'
-        ]
-        
-        page_text_lower = request.page_text.lower()
-        for keyword in scam_keywords:
-            if keyword in page_text_lower:
-                alerts.append({
-                    'type': 'warning',
-                    'message': f'Potential scam indicator detected: "{keyword}"'
-                })
-        
-        return {
-            **legitimacy_result,
-            'alerts': alerts,
-            'page_analysis': {
-                'title': request.title,
-                'text_length': len(request.page_text),
-                'suspicious_elements': request.suspicious_elements
-            }
-        }
+        # Not cached: keying by the page text would cost about as much as scanning it
+        return await compute_page_analysis(request)
         
     except Exception as e:
         logger.error(f"Page analysis error: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+async def compute_page_analysis(request: PageAnalysisRequest) -> Dict[str, Any]:
+    """Legitimacy and scam indicator analysis of a page"""
+    analysis_data = request.dict()
+    legitimacy_result = analyze_website_legitimacy(analysis_data)
+    
+    # Add page-specific analysis
+    alerts = []
+    
+    # Check for scam indicators in page text
+    page_text_lower = request.page_text.lower()
+    for match in PAGE_SCAM_MATCHER.find(page_text_lower):
+        alerts.append({
+            'type': 'warning',
+            'message': f'Potential scam indicator detected: "{match.phrase}"'
+        })
+    
+    return {
+        **legitimacy_result,
+        'alerts': alerts,
+        'page_analysis': {
+            'title': request.title,
+            'text_length': len(request.page_text),
+            'suspicious_elements': request.suspicious_elements
+        }
+    }
+
 @app.post("/api/v1/analyze/legitimacy", response_model=WebsiteAnalysisResponse)
 async def analyze_legitimacy(
     request: WebsiteAnalysisRequest,
+    background_tasks: BackgroundTasks,
     user=Depends(verify_token)
 ):
     """Analyze website legitimacy"""
-    return await analyze_website(request, BackgroundTasks(), user)
+    return await analyze_website(request, background_tasks, user)
 
 @app.post("/api/v1/analyze/trust-score")
 async def get_trust_score(
@@ -753,22 +988,14 @@ async def analyze_text(
     try:
         text = request.text.lower()
         
-        scam_indicators = []
-        scam_patterns = {
-            'urgency': ['limited time', 'act now', 'expires today', 'hurry'],
-            'money_promises': ['guaranteed income', 'make money fast', 'easy money'],
-            'fake_urgency': ['only today', 'last chance', 'don\'t miss out'],
-            'personal_info': ['ssn', 'social security', 'bank account', 'routing number']
-        }
-        
-        for category, patterns in scam_patterns.items():
-            for pattern in patterns:
-                if pattern in text:
-                    scam_indicators.append({
-                        'category': category,
-                        'pattern': pattern,
-                        'severity': 'high' if category == 'personal_info' else 'medium'
-                    })
+        scam_indicators = [
+            {
+                'category': match.category,
+                'pattern': match.phrase,
+                'severity': match.severity
+            }
+            for match in TEXT_SCAM_MATCHER.find(text)
+        ]
         
         risk_level = 'high' if any(i['severity'] == 'high' for i in scam_indicators) else \
                     'medium' if scam_indicators else 'low'
@@ -783,40 +1010,89 @@ async def analyze_text(
         logger.error(f"Text analysis error: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Whether an If-None-Match header names the given entity tag"""
+    if not if_none_match:
+        return False
+    tags = [value.strip() for value in if_none_match.split(',')]
+    return '*' in tags or any(value.removeprefix('W/').strip('"') == tag for value in tags)
+
+def require_blocklist():
+    """Refuse to serve the built-in list while the configured feeds have not been ingested"""
+    if not blocklist_ingestor.ready:
+        raise HTTPException(status_code=503, detail="Blocklist is loading", headers={'Retry-After': '30'})
+
+def blocklist_response(
+    get_body: Callable[[], bytes],
+    if_none_match: Optional[str],
+    tag: Optional[str] = None,
+    media_type: str = 'application/json'
+) -> Response:
+    """Blocklist body tagged with its version; 304 when the client already has that version"""
+    tag = tag or blocklist_store.version
+    headers = {'ETag': f'"{tag}"', 'Cache-Control': 'no-cache'}
+    if etag_matches(if_none_match, tag):
+        blocklist_store.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=get_body(), media_type=media_type, headers=headers)
+
 @app.get("/api/v1/security/malicious-domains")
-async def get_malicious_domains():
+async def get_malicious_domains(if_none_match: Optional[str] = Header(None)):
     """Get list of known malicious domains"""
+    require_blocklist()
     try:
-        # Mock malicious domains - replace with real threat intelligence
-        malicious_domains = [
-            'fakeshop-scam.com',
-            'phishing-site.net',
-            'malware-download.org'
-        ]
-        
-        # Add more domains to the list for testing
-        additional_domains = [
-            'scam-crypto.com',
-            'fake-login.net',
-            'trojan-installer.site',
-            'data-stealer.xyz',
-            'bank-phishing.info',
-            'free-virus.com',
-            'spam-center.net',
-            'malicious-downloads.co',
-            'credential-theft.org',
-            'ransomware-host.com'
-        ]
-        
-        malicious_domains.extend(additional_domains)
-        
-        return {'domains': malicious_domains}
-        
+        return blocklist_response(blocklist_store.full_body, if_none_match)
         
     except Exception as e:
         logger.error(f"Error getting malicious domains: {e}")
         return {'domains': []}
 
+@app.get("/api/v1/security/malicious-domains/delta")
+async def get_malicious_domains_delta(since: str, if_none_match: Optional[str] = Header(None)):
+    """Domains added and removed since a version; the full list when that version is too old"""
+    require_blocklist()
+    return blocklist_response(
+        lambda: blocklist_store.delta_body(since) or blocklist_store.full_body(),
+        if_none_match
+    )
+
+@app.get("/api/v1/security/malicious-domains/filter")
+async def get_malicious_domains_filter(
+    fp_rate: Optional[float] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Bloom filter of the blocklist as a binary blob; hits must be confirmed with /security/lookup"""
+    require_blocklist()
+    index = blocklist_store.current
+    try:
+        fp_rate = blocklist_filters.select_fp_rate(fp_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    tag = blocklist_filters.tag(index, fp_rate)
+    if etag_matches(if_none_match, tag):
+        return blocklist_response(lambda: b'', if_none_match, tag)
+
+    blob = await request_flights.do(('blocklist-filter', tag), lambda: blocklist_filters.get_blob(index, fp_rate))
+    return blocklist_response(lambda: blob, if_none_match, tag, media_type='application/octet-stream')
+
+@app.get("/api/v1/security/lookup")
+async def lookup_domain(host: str):
+    """Check whether a host (or URL) or any of its parent domains is blocked"""
+    require_blocklist()
+    index = blocklist_store.current
+    result = index.lookup([host])[0]
+    result['version'] = index.version
+    return result
+
+@app.post("/api/v1/security/lookup")
+async def lookup_domains(request: DomainLookupRequest):
+    """Check a batch of hosts or URLs against the blocklist"""
+    if len(request.hosts) > MAX_LOOKUP_HOSTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_HOSTS} hosts per lookup")
+    require_blocklist()
+    index = blocklist_store.current
+    return {'results': index.lookup(request.hosts), 'version': index.version}
+
 @app.post("/api/v1/security/report-malicious")
 async def report_malicious(
     request: MaliciousReportRequest,
@@ -849,6 +1125,50 @@ async def report_suspicious(
         logger.error(f"Error reporting suspicious activity: {e}")
         return {'success': False}
 
+@app.get("/api/v1/metrics/inference")
+async def get_inference_metrics():
+    """Inference batching metrics for tuning batch size and wait time"""
+    return {
+        'scheduler': inference_scheduler.get_metrics(),
+        'review_cache': review_cache.get_stats(),
+        'page_index': page_review_index.get_stats(),
+        'cascade': review_cascade.get_stats() if review_cascade is not None else None,
+        'near_duplicates': near_duplicate_index.get_stats() if near_duplicate_index is not None else None,
+        'request_coalescing': request_flights.get_stats(),
+        'deep_analysis': deep_analysis_limiter.get_stats(),
+        'blocklist': blocklist_store.get_stats(),
+        'blocklist_filters': blocklist_filters.get_stats(),
+        'blocklist_ingestion': blocklist_ingestor.get_status(),
+        'model_version': model_registry.current.version
+    }
+
+@app.get("/api/v1/admin/models")
+async def get_model_status(user=Depends(verify_token)):
+    """Currently served review model version"""
+    return model_registry.get_status()
+
+@app.post("/api/v1/admin/models/reload")
+async def reload_models(user=Depends(verify_admin)):
+    """Load the model files again and swap them in once warmed"""
+    try:
+        reloaded = await model_registry.reload(force=True)
+        return {'reloaded': reloaded, **model_registry.get_status()}
+    
+    except Exception as e:
+        logger.error(f"Model reload error: {e}")
+        raise HTTPException(status_code=500, detail="Model reload failed")
+
+@app.post("/api/v1/admin/blocklist/reload")
+async def reload_blocklist(user=Depends(verify_admin)):
+    """Ingest the blocklist feeds again and publish them as a new version if they changed"""
+    try:
+        published = await blocklist_ingestor.reload(force=True)
+        return {'published': published, **blocklist_store.get_stats(), 'ingestion': blocklist_ingestor.get_status()}
+    
+    except Exception as e:
+        logger.error(f"Blocklist reload error: {e}")
+        raise HTTPException(status_code=500, detail="Blocklist reload failed")
+
 @app.post("/api/v1/user/sync")
 async def sync_user_data(
     data: Dict[str, Any],
@@ -895,12 +1215,16 @@ async def process_suspicious_report(report_data: Dict[str, Any]):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     logger.error(f"HTTP exception: {exc.detail}")
-    return {"error": exc.detail, "status_code": exc.status_code}
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": exc.detail, "status_code": exc.status_code},
+        headers=exc.headers
+    )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     logger.error(f"Unexpected error: {str(exc)}")
-    return {"error": "Internal server error", "status_code": 500}
+    return JSONResponse(status_code=500, content={"error": "Internal server error", "status_code": 500})
 
 # ============================================================================
 # FIREBASE INITIALIZATION
@@ -1037,6 +1361,7 @@ async def get_threat_statistics():
 # MAIN
 # ============================================================================
 
+# Development server with auto-reload; use `python -m app.serve` in production
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
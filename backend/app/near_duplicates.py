@@ -0,0 +1,222 @@
+"""
+Near-duplicate review detection.
+Reviews are reduced to MinHash signatures over character shingles and indexed with LSH banding,
+so lightly edited copies of a review are found among a bounded history of recent reviews.
+"""
+
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+from collections import OrderedDict
+import os
+import re
+
+import numpy as np
+
+NEAR_DUPLICATES_ENABLED = os.getenv('FAKEBUSTER_NEAR_DUPLICATES', '1') == '1'
+# Signatures kept in the history; memory is bounded by this count
+NEAR_DUPLICATE_HISTORY = int(os.getenv('FAKEBUSTER_NEAR_DUPLICATE_HISTORY', '20000'))
+# Estimated Jaccard similarity of shingle sets above which two reviews are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('FAKEBUSTER_NEAR_DUPLICATE_THRESHOLD', '0.7'))
+
+SHINGLE_SIZE = int(os.getenv('FAKEBUSTER_SHINGLE_SIZE', '5'))
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs above ~0.5 similarity become candidates with high probability
+LSH_BANDS = 16
+# Keys kept per LSH bucket; very common texts ("great product") would otherwise make every
+# lookup compare against thousands of candidates. The most recent keys are kept.
+LSH_BUCKET_SIZE = 32
+
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+_HASH_SEED = 0x5EED
+_rng = np.random.default_rng(_HASH_SEED)
+# Multiply-shift hash family; multipliers must be odd
+_PERMUTATION_A = _rng.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERMUTATION_B = _rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_BASE = np.uint64(1_000_003)
+_SHINGLE_MIX = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY_SIGNATURE = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def normalize_review_text(text: str) -> str:
+    """Lowercase and collapse punctuation and whitespace, so trivial edits do not change shingles"""
+    return _NON_WORD_PATTERN.sub(' ', text.lower()).strip()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Distinct 32-bit hashes of the character shingles of a normalized text"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.empty(0, dtype=np.uint64)
+    size = min(size, len(codes))
+
+    # Polynomial hash of every window, computed for all windows at once (wrapping mod 2^64)
+    n_windows = len(codes) - size + 1
+    window_hash = np.zeros(n_windows, dtype=np.uint64)
+    for offset in range(size):
+        window_hash = window_hash * _SHINGLE_BASE + codes[offset:offset + n_windows]
+    return np.unique((window_hash * _SHINGLE_MIX) >> np.uint64(32))
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (uint32 per permutation) of a review's shingle set"""
+    shingles = shingle_hashes(normalize_review_text(text))
+    if len(shingles) == 0:
+        return _EMPTY_SIGNATURE
+    hashed = (_PERMUTATION_A[:, None] * shingles[None, :] + _PERMUTATION_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def minhash_signatures(texts: Sequence[str]) -> np.ndarray:
+    """Signatures of a batch as a (n, permutations) matrix (one feature executor task)"""
+    signatures = np.empty((len(texts), MINHASH_PERMUTATIONS), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        signatures[i] = minhash_signature(text)
+    return signatures
+
+
+class _Entry:
+    __slots__ = ('signature', 'cluster_id')
+
+    def __init__(self, signature: np.ndarray, cluster_id: str):
+        self.signature = signature
+        self.cluster_id = cluster_id
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over the MinHash signatures of recently seen reviews.
+    Reviews that are near-duplicates of each other share a cluster id; the oldest
+    signatures are forgotten once the history is full (roughly 2 KB per signature).
+    Used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_signatures: int = NEAR_DUPLICATE_HISTORY,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        bands: int = LSH_BANDS,
+    ):
+        if MINHASH_PERMUTATIONS % bands:
+            raise ValueError(f"{bands} bands do not divide {MINHASH_PERMUTATIONS} permutations")
+        self.max_signatures = max(1, max_signatures)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = MINHASH_PERMUTATIONS // bands
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # One bucket table per band: band hash -> key of the entry in that bucket, or a list
+        # of keys once several entries share it (most buckets hold a single entry)
+        self._buckets: List[Dict[int, Any]] = [{} for _ in range(bands)]
+        self._cluster_sizes: Dict[str, int] = {}
+        self._next_cluster = 0
+
+        self.lookups = 0
+        self.duplicates_found = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        """One 64-bit hash per band of the signature"""
+        band_hash = np.zeros(self.bands, dtype=np.uint64)
+        for row in signature.reshape(self.bands, self.rows_per_band).T.astype(np.uint64):
+            band_hash = band_hash * _SHINGLE_MIX + row
+        return band_hash.tolist()
+
+    def _best_match(self, signature: np.ndarray, band_keys: List[int]) -> Optional[_Entry]:
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, band_keys):
+            bucket = buckets.get(band_key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, list):
+                candidates.update(bucket)
+            else:
+                candidates.add(bucket)
+        if not candidates:
+            return None
+
+        entries = [self._entries[key] for key in candidates]
+        similarities = np.count_nonzero(
+            np.stack([entry.signature for entry in entries]) == signature, axis=1
+        ) / MINHASH_PERMUTATIONS
+        best = int(np.argmax(similarities))
+        return entries[best] if similarities[best] >= self.threshold else None
+
+    def _evict_oldest(self):
+        key, entry = self._entries.popitem(last=False)
+        for buckets, band_key in zip(self._buckets, self._band_keys(entry.signature)):
+            bucket = buckets.get(band_key)
+            if isinstance(bucket, list):
+                # May already have been pushed out of a full bucket
+                if key in bucket:
+                    bucket.remove(key)
+                if len(bucket) == 1:
+                    buckets[band_key] = bucket[0]
+            elif bucket == key:
+                del buckets[band_key]
+        self._cluster_sizes[entry.cluster_id] -= 1
+        if not self._cluster_sizes[entry.cluster_id]:
+            del self._cluster_sizes[entry.cluster_id]
+        self.evictions += 1
+
+    def add(self, key: Hashable, signature: np.ndarray) -> str:
+        """Index a review under a key and return its cluster id; a known key keeps its cluster"""
+        self.lookups += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry.cluster_id
+
+        band_keys = self._band_keys(signature)
+        match = self._best_match(signature, band_keys)
+        if match is not None:
+            cluster_id = match.cluster_id
+            self.duplicates_found += 1
+        else:
+            cluster_id = f"dup-{self._next_cluster:x}"
+            self._next_cluster += 1
+
+        self._entries[key] = _Entry(signature, cluster_id)
+        for buckets, band_key in zip(self._buckets, band_keys):
+            bucket = buckets.get(band_key)
+            if bucket is None:
+                buckets[band_key] = key
+            elif isinstance(bucket, list):
+                bucket.append(key)
+                if len(bucket) > LSH_BUCKET_SIZE:
+                    del bucket[0]
+            else:
+                buckets[band_key] = [bucket, key]
+        self._cluster_sizes[cluster_id] = self._cluster_sizes.get(cluster_id, 0) + 1
+
+        while len(self._entries) > self.max_signatures:
+            self._evict_oldest()
+        return cluster_id
+
+    def assign_clusters(self, keys: Sequence[Hashable], signatures: np.ndarray) -> List[Optional[str]]:
+        """
+        Index a batch of reviews and return the cluster id of each one that has at least one
+        near-duplicate, earlier in the batch, later in the batch or in the history; None otherwise.
+        """
+        cluster_ids = [
+            # Reviews without any text are never clustered
+            self.add(key, signature) if not np.array_equal(signature, _EMPTY_SIGNATURE) else None
+            for key, signature in zip(keys, signatures)
+        ]
+        return [
+            cluster_id if self._cluster_sizes.get(cluster_id, 0) > 1 else None
+            for cluster_id in cluster_ids
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'signatures': len(self._entries),
+            'max_signatures': self.max_signatures,
+            'threshold': self.threshold,
+            'clusters': sum(1 for size in self._cluster_sizes.values() if size > 1),
+            'lookups': self.lookups,
+            'duplicates_found': self.duplicates_found,
+            'evictions': self.evictions,
+        }
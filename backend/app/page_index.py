@@ -0,0 +1,139 @@
+"""
+Per-URL review-set index for incremental page re-analysis.
+Remembers the fake probability of every review already scored for a page, so a revisit only
+runs the model on new reviews, and keeps a running aggregate over them.
+"""
+
+from typing import Any, Dict, Hashable, Optional
+import os
+
+from .cache import LRUTTLCache
+from .inference import FAKE_THRESHOLD
+
+PAGE_INDEX_SIZE = int(os.getenv('FAKEBUSTER_PAGE_INDEX_SIZE', '10000'))
+PAGE_INDEX_TTL = float(os.getenv('FAKEBUSTER_PAGE_INDEX_TTL', '3600'))
+PAGE_MAX_REVIEWS = int(os.getenv('FAKEBUSTER_PAGE_MAX_REVIEWS', '5000'))
+# Reviews remembered across all pages (about 100 bytes each); least recently used pages go first
+PAGE_INDEX_MAX_ENTRIES = int(os.getenv('FAKEBUSTER_PAGE_INDEX_MAX_ENTRIES', '1000000'))
+
+
+def page_entry_key(review_key: str, occurrence: int) -> bytes:
+    """
+    16-byte key of a review on a page: 96 bits of its review cache key and its occurrence,
+    so identical texts on one page are separate reviews.
+    """
+    return bytes.fromhex(review_key[:24]) + occurrence.to_bytes(4, 'little')
+
+
+def _confidence(fake_probability: float) -> float:
+    return fake_probability if fake_probability > 0.5 else 1 - fake_probability
+
+
+class PageReviewSet:
+    """Scored reviews of one page and their aggregate"""
+
+    def __init__(self, model_version: str, max_reviews: int):
+        self.model_version = model_version
+        self.max_reviews = max(1, max_reviews)
+        # Page entry key -> fake probability
+        self.probabilities: Dict[bytes, float] = {}
+        self.fake_count = 0
+        self.confidence_sum = 0.0
+        # False once dropped from the index; requests still holding the page no longer count
+        self.indexed = True
+
+    def __len__(self) -> int:
+        return len(self.probabilities)
+
+    def get(self, entry_key: bytes) -> Optional[float]:
+        """Fake probability of a review already scored for the page"""
+        return self.probabilities.get(entry_key)
+
+    def add(self, entry_key: bytes, fake_probability: float):
+        """Merge a newly scored review into the aggregate"""
+        if entry_key in self.probabilities:
+            return
+
+        self.probabilities[entry_key] = fake_probability
+        self.fake_count += 1 if fake_probability > FAKE_THRESHOLD else 0
+        self.confidence_sum += _confidence(fake_probability)
+
+        # Forget the oldest reviews once the page grows past its bound
+        while len(self.probabilities) > self.max_reviews:
+            self._forget(next(iter(self.probabilities)))
+
+    def _forget(self, entry_key: bytes):
+        fake_probability = self.probabilities.pop(entry_key)
+        self.fake_count -= 1 if fake_probability > FAKE_THRESHOLD else 0
+        self.confidence_sum -= _confidence(fake_probability)
+
+    @property
+    def total_reviews(self) -> int:
+        return len(self.probabilities)
+
+    @property
+    def confidence(self) -> float:
+        return self.confidence_sum / len(self.probabilities) if self.probabilities else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'fake_reviews': self.fake_count,
+            'total_reviews': self.total_reviews,
+            'confidence': self.confidence,
+        }
+
+
+class PageReviewIndex:
+    """LRU/TTL index of page URL to the set of reviews already scored for it"""
+
+    def __init__(
+        self,
+        max_pages: int,
+        ttl_seconds: Optional[float],
+        max_reviews_per_page: int,
+        max_entries: int = PAGE_INDEX_MAX_ENTRIES,
+    ):
+        self.pages = LRUTTLCache(max_pages, ttl_seconds, on_evict=self._on_evict)
+        self.max_reviews_per_page = max_reviews_per_page
+        self.max_entries = max(1, max_entries)
+        # Reviews held by all pages, kept in step with adds and evictions
+        self.entries = 0
+
+    @staticmethod
+    def page_key(url: str) -> str:
+        return url.split('#', 1)[0]
+
+    def _on_evict(self, key: Hashable, page: PageReviewSet):
+        self.entries -= len(page)
+        page.indexed = False
+
+    def get_page(self, url: str, model_version: str) -> PageReviewSet:
+        """Return the review set for a page, starting over when the model changed"""
+        key = self.page_key(url)
+        page = self.pages.get(key)
+        if page is None or page.model_version != model_version:
+            if page is not None:
+                self._on_evict(key, page)
+            page = PageReviewSet(model_version, self.max_reviews_per_page)
+            self.pages.put(key, page)
+        return page
+
+    def add(self, page: PageReviewSet, entry_key: bytes, fake_probability: float):
+        """Add a review to a page, evicting least recently used pages past the entry budget"""
+        before = len(page)
+        page.add(entry_key, fake_probability)
+        if not page.indexed:
+            return
+        self.entries += len(page) - before
+
+        # The page being added to was just used, so it is evicted last
+        while self.entries > self.max_entries and len(self.pages) > 1:
+            self.pages.evict_oldest()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.pages.get_stats(),
+            'max_reviews_per_page': self.max_reviews_per_page,
+            'reviews': self.entries,
+            'max_reviews': self.max_entries,
+        }
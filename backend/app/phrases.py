@@ -0,0 +1,144 @@
+"""
+Multi-pattern phrase matching for the keyword detectors.
+Every detector is compiled once at import time and reports all matching phrases, with category and
+severity, from a single call over the lowercased text.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+from bisect import bisect_right
+
+import numpy as np
+
+
+class PhrasePattern(NamedTuple):
+    phrase: str
+    category: str
+    severity: str
+
+
+class PhraseMatcher:
+    """Compiled set of categorized phrases matched against lowercased text"""
+
+    def __init__(self, patterns: Iterable[PhrasePattern]):
+        self.patterns: List[PhrasePattern] = list(patterns)
+
+        # Phrases shared between categories are only searched once
+        ids_by_phrase: Dict[str, List[int]] = {}
+        for pattern_id, pattern in enumerate(self.patterns):
+            ids_by_phrase.setdefault(pattern.phrase, []).append(pattern_id)
+        self._phrases = list(ids_by_phrase)
+        self._ids_by_phrase = [tuple(ids) for ids in ids_by_phrase.values()]
+
+    def find_ids(self, text: str) -> Set[int]:
+        """Return the ids of all patterns that occur in the (already lowercased) text"""
+        found: Set[int] = set()
+        for phrase, ids in zip(self._phrases, self._ids_by_phrase):
+            if phrase in text:
+                found.update(ids)
+        return found
+
+    def find(self, text: str) -> List[PhrasePattern]:
+        """Return the patterns that occur in the text, in registration order"""
+        return [self.patterns[pattern_id] for pattern_id in sorted(self.find_ids(text))]
+
+    def count(self, text: str) -> int:
+        """Count distinct patterns that occur in the text"""
+        return len(self.find_ids(text))
+
+    def count_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Count distinct patterns per (already lowercased) text, scanning the whole batch once per phrase"""
+        counts = np.zeros(len(texts), dtype=np.int64)
+        if not texts:
+            return counts
+
+        # Texts are joined with a separator no phrase contains, so a match never spans two texts
+        joined = '\0'.join(texts)
+        starts = [0] * len(texts)
+        for i in range(1, len(texts)):
+            starts[i] = starts[i - 1] + len(texts[i - 1]) + 1
+
+        last = len(texts) - 1
+        for phrase, ids in zip(self._phrases, self._ids_by_phrase):
+            if not phrase or '\0' in phrase:
+                continue
+            matched = []
+            position = joined.find(phrase)
+            while position != -1:
+                # Only the first occurrence per text counts; resume at the next text
+                text_index = bisect_right(starts, position) - 1
+                matched.append(text_index)
+                if text_index == last:
+                    break
+                position = joined.find(phrase, starts[text_index + 1])
+            if matched:
+                counts[matched] += len(ids)
+        return counts
+
+    def count_by_category(self, text: str) -> Dict[str, int]:
+        """Count distinct matched patterns per category"""
+        counts: Dict[str, int] = {}
+        for pattern_id in self.find_ids(text):
+            category = self.patterns[pattern_id].category
+            counts[category] = counts.get(category, 0) + 1
+        return counts
+
+
+def compile_phrases(
+    phrases_by_category: Dict[str, List[str]],
+    severities: Optional[Dict[str, str]] = None,
+) -> PhraseMatcher:
+    """Compile categorized phrase lists into one matcher"""
+    severities = severities or {}
+    return PhraseMatcher(
+        (
+            PhrasePattern(phrase.lower(), category, severities.get(category, 'medium'))
+            for category, phrases in phrases_by_category.items()
+            for phrase in phrases
+        )
+    )
+
+
+# ============================================================================
+# KEYWORD DETECTORS
+# ============================================================================
+
+# Phrases used by FallbackReviewClassifier
+FALLBACK_FAKE_INDICATORS = [
+    'amazing', 'perfect', 'best ever', 'life changing',
+    'highly recommend', 'must buy', 'incredible',
+    'outstanding', 'excellent quality', 'fast shipping'
+]
+
+# Phrases used by extract_features_from_review
+POSITIVE_WORDS = ['amazing', 'excellent', 'perfect', 'outstanding', 'incredible']
+NEGATIVE_WORDS = ['terrible', 'awful', 'horrible', 'worst', 'disappointing']
+REVIEW_FAKE_INDICATORS = [
+    'life changing', 'best purchase ever', 'highly recommend',
+    'must buy', 'changed my life', 'amazing quality'
+]
+
+# Phrases used by analyze_page
+PAGE_SCAM_KEYWORDS = [
+    'limited time offer', 'act now', 'exclusive deal',
+    'guaranteed income', 'work from home', 'make money fast'
+]
+
+# Phrases used by analyze_text
+TEXT_SCAM_PATTERNS = {
+    'urgency': ['limited time', 'act now', 'expires today', 'hurry'],
+    'money_promises': ['guaranteed income', 'make money fast', 'easy money'],
+    'fake_urgency': ['only today', 'last chance', 'don\'t miss out'],
+    'personal_info': ['ssn', 'social security', 'bank account', 'routing number']
+}
+
+FALLBACK_REVIEW_MATCHER = compile_phrases({'fake_indicator': FALLBACK_FAKE_INDICATORS})
+
+REVIEW_PHRASE_MATCHER = compile_phrases({
+    'positive': POSITIVE_WORDS,
+    'negative': NEGATIVE_WORDS,
+    'fake_indicator': REVIEW_FAKE_INDICATORS,
+})
+
+PAGE_SCAM_MATCHER = compile_phrases({'scam_keyword': PAGE_SCAM_KEYWORDS})
+
+TEXT_SCAM_MATCHER = compile_phrases(TEXT_SCAM_PATTERNS, severities={'personal_info': 'high'})
@@ -0,0 +1,278 @@
+"""
+Hot-reloadable model registry.
+Loads the review model in the background, warms it and swaps it in atomically with a version tag.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from datetime import datetime
+import asyncio
+import functools
+import logging
+import os
+import pickle
+
+from .features import extract_feature_matrix
+from .artifacts import MANIFEST_FILE, NATIVE_MODEL_FILE, NATIVE_REVIEWS_FILE, read_manifest, load_artifacts, model_version
+from .tree_ensemble import INFERENCE_BACKEND, INFERENCE_BACKENDS, CompileError, SmallBatchModel, compile_with_parity
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv('FAKEBUSTER_MODELS_DIR', 'models')
+REVIEW_MODEL_FILE = 'xgboost_model.pkl'
+PROCESSED_REVIEWS_FILE = 'processed_reviews.pkl'
+
+# Seconds between checks of the models directory for new files; 0 disables watching
+MODEL_WATCH_INTERVAL = float(os.getenv('FAKEBUSTER_MODEL_WATCH_INTERVAL', '30'))
+
+WARMUP_TEXTS = [
+    "This product is AMAZING!!! Best purchase ever, highly recommend.",
+    "Works as described. Shipping took a week.",
+    "Contact me at deals@example.com or visit http://example.com for a discount?",
+]
+
+
+class ModelBundle:
+    """One loaded model version; never mutated after it is published"""
+
+    __slots__ = ('review_model', 'vectorizer', 'version', 'source', 'backend', 'loaded_at')
+
+    def __init__(self, review_model: Any, vectorizer: Any, version: str, source: str, backend: str = 'native'):
+        self.review_model = review_model
+        self.vectorizer = vectorizer
+        self.version = version
+        self.source = source
+        self.backend = backend
+        self.loaded_at = datetime.utcnow()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'source': self.source,
+            'backend': self.backend,
+            'model_type': type(self.review_model).__name__ if self.review_model is not None else None,
+            'loaded_at': self.loaded_at.isoformat(),
+        }
+
+
+EMPTY_BUNDLE = ModelBundle(None, None, "none", "none")
+
+
+class ModelRegistry:
+    """Holds the current model bundle and replaces it when the model files change"""
+
+    def __init__(
+        self,
+        models_dir: str = MODELS_DIR,
+        fallback_factory: Optional[Callable[[], Tuple[Any, Any]]] = None,
+        ml_available: bool = True,
+        backend: str = INFERENCE_BACKEND,
+    ):
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+
+        self.models_dir = models_dir
+        self.fallback_factory = fallback_factory
+        self.ml_available = ml_available
+        self.backend = backend
+
+        self.current: ModelBundle = EMPTY_BUNDLE
+        self.reload_count = 0
+        self.last_error: Optional[str] = None
+
+        self.preloaded = False
+        self._fingerprint: Optional[Tuple] = None
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.models_dir, filename)
+
+    def fingerprint(self) -> Tuple:
+        """Size and modification time of every model file, used to detect new versions"""
+        entries = []
+        for filename in (MANIFEST_FILE, NATIVE_MODEL_FILE, NATIVE_REVIEWS_FILE, REVIEW_MODEL_FILE, PROCESSED_REVIEWS_FILE):
+            try:
+                stat = os.stat(self._path(filename))
+                entries.append((filename, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                entries.append((filename, None, None))
+        return tuple(entries)
+
+    def load_bundle(self, warm: bool = True, allow_fallback: bool = True) -> ModelBundle:
+        """
+        Load and (optionally) warm a model bundle from the models directory (blocking).
+        Without warm the model is neither run nor compiled for the numpy backend (see preload).
+        Missing model files yield the fallback bundle, or raise FileNotFoundError without allow_fallback.
+        """
+        if not self.ml_available:
+            logger.info("ML libraries not available. Using rule-based fallback only.")
+            return EMPTY_BUNDLE
+
+        # Native artifacts written by `python -m app.artifacts convert` take precedence over pickles,
+        # unless a newer pickle was dropped in since the conversion
+        manifest = read_manifest(self.models_dir)
+        if manifest is not None and self.pickle_is_newer():
+            logger.warning(
+                f"{REVIEW_MODEL_FILE} is newer than {MANIFEST_FILE}; serving the pickle. "
+                f"Run `python -m app.artifacts convert` to update the native artifacts."
+            )
+            manifest = None
+        if manifest is not None:
+            review_model, processed_reviews, version = load_artifacts(self.models_dir, manifest)
+            review_model, backend = self.select_backend(review_model) if warm else (review_model, 'native')
+            bundle = ModelBundle(review_model, processed_reviews, version, 'native', backend)
+            if warm:
+                self.warm(bundle)
+            return bundle
+
+        try:
+            # Load XGBoost model for advanced review analysis
+            with open(self._path(REVIEW_MODEL_FILE), 'rb') as f:
+                model_bytes = f.read()
+            review_model = pickle.loads(model_bytes)
+            version = model_version(review_model, model_bytes)
+
+            # Load the preprocessed reviews data for comparison
+            with open(self._path(PROCESSED_REVIEWS_FILE), 'rb') as f:
+                vectorizer = pickle.load(f)
+
+            review_model, backend = self.select_backend(review_model) if warm else (review_model, 'native')
+            bundle = ModelBundle(review_model, vectorizer, version, 'pickle', backend)
+
+        except FileNotFoundError as e:
+            if not allow_fallback:
+                raise
+            logger.warning(f"Model file not found: {e}. Using fallback algorithms.")
+            if self.fallback_factory is None:
+                return EMPTY_BUNDLE
+            try:
+                review_model, vectorizer = self.fallback_factory()
+            except Exception as fallback_error:
+                logger.error(f"Failed to initialize fallback models: {fallback_error}")
+                return EMPTY_BUNDLE
+            bundle = ModelBundle(review_model, vectorizer, "fallback-rules", 'fallback')
+
+        if warm:
+            self.warm(bundle)
+        return bundle
+
+    def pickle_is_newer(self) -> bool:
+        """True when the pickled review model was modified after the manifest was written"""
+        try:
+            return os.stat(self._path(REVIEW_MODEL_FILE)).st_mtime_ns > os.stat(self._path(MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def select_backend(self, review_model: Any) -> Tuple[Any, str]:
+        """Return the model to serve with and its backend, compiling it when the numpy backend is selected"""
+        if self.backend != 'numpy':
+            return review_model, 'native'
+        try:
+            compiled = compile_with_parity(review_model, extract_feature_matrix(WARMUP_TEXTS))
+        except CompileError as e:
+            logger.error(f"Cannot use the numpy backend, serving the native model: {e}")
+            return review_model, 'native'
+        logger.info(f"Review model compiled to the numpy backend ({compiled.n_trees} trees)")
+        return SmallBatchModel(compiled, review_model), 'numpy'
+
+    def preload(self):
+        """
+        Load the current bundle synchronously in a parent process before workers fork.
+        Warming and compiling (whose parity check runs the model) are left to each worker, see
+        prepare_worker: model libraries may start thread pools that do not survive fork.
+        """
+        fingerprint = self.fingerprint()
+        self.current = self.load_bundle(warm=False)
+        self._fingerprint = fingerprint
+        self.preloaded = True
+        logger.info(f"Review model {self.current.version} preloaded")
+
+    def prepare_worker(self):
+        """Compile a preloaded bundle for the selected backend and warm it, in a forked worker (blocking)"""
+        bundle = self.current
+        if bundle.review_model is not None and bundle.source != 'fallback' and bundle.backend != self.backend:
+            review_model, backend = self.select_backend(bundle.review_model)
+            if backend != bundle.backend:
+                bundle = ModelBundle(review_model, bundle.vectorizer, bundle.version, bundle.source, backend)
+        self.warm(bundle)
+        self.current = bundle
+
+    @staticmethod
+    def warm(bundle: ModelBundle):
+        """Run a small prediction so the first real request does not pay initialization costs"""
+        if bundle.review_model is None:
+            return
+        if getattr(bundle.review_model, 'accepts_texts', False):
+            bundle.review_model.predict_proba(WARMUP_TEXTS)
+        else:
+            bundle.review_model.predict_proba(extract_feature_matrix(WARMUP_TEXTS))
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Load the model files in the background and swap them in atomically.
+        Returns True when a new bundle was published. A failed reload keeps serving the current bundle.
+        """
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+
+        async with self._reload_lock:
+            fingerprint = self.fingerprint()
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            # Model files missing while a real model is served are a failed (possibly partial)
+            # update, not a reason to downgrade production to the fallback rules
+            allow_fallback = self.current is EMPTY_BUNDLE or self.current.source == 'fallback'
+            loop = asyncio.get_running_loop()
+            try:
+                bundle = await loop.run_in_executor(None, functools.partial(self.load_bundle, allow_fallback=allow_fallback))
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error loading models: {e}")
+                if self.current is EMPTY_BUNDLE and self.reload_count == 0:
+                    raise
+                return False
+
+            self._fingerprint = fingerprint
+            self.last_error = None
+            if bundle.version == self.current.version and self.current is not EMPTY_BUNDLE:
+                return False
+
+            # Publishing is a single reference assignment; requests that already
+            # read the previous bundle finish with it
+            previous = self.current
+            self.current = bundle
+            self.reload_count += 1
+            logger.info(f"Review model {bundle.version} loaded (previous: {previous.version})")
+            return True
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Model reload failed: {e}")
+
+    def start_watching(self, interval: float = MODEL_WATCH_INTERVAL):
+        """Poll the models directory and reload when the model files change"""
+        if interval > 0 and (self._watch_task is None or self._watch_task.done()):
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        if self._watch_task is not None and not self._watch_task.done():
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+        self._watch_task = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            **self.current.describe(),
+            'models_dir': self.models_dir,
+            'reload_count': self.reload_count,
+            'watching': self._watch_task is not None and not self._watch_task.done(),
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,167 @@
+"""
+Cross-request micro-batching for model inference.
+Concurrent requests are queued and scored together in one model call.
+"""
+
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import logging
+import os
+import numpy as np
+
+from .inference import MAX_BATCH_SIZE, predict_fake_probabilities
+from .executors import run_model_task
+
+logger = logging.getLogger(__name__)
+
+# How long the scheduler waits for more requests before running a partial batch
+MAX_BATCH_WAIT_MS = float(os.getenv('FAKEBUSTER_BATCH_MAX_WAIT_MS', '2'))
+
+
+class InferenceScheduler:
+    """Collects concurrent prediction requests into shared model batches"""
+
+    def __init__(
+        self,
+        model_provider: Callable[[], Any],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        self.model_provider = model_provider
+        self.max_batch_size = max(1, max_batch_size or MAX_BATCH_SIZE)
+        self.max_wait = (MAX_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+
+        self._pending: Deque[Tuple[np.ndarray, Any, asyncio.Future]] = deque()
+        self._pending_rows = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_rows = 0
+        self.max_batch_rows = 0
+        self.last_batch_rows = 0
+        self.last_batch_requests = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._pending.clear()
+            self._pending_rows = 0
+            self._worker = loop.create_task(self._run())
+
+    async def predict(self, feature_matrix: np.ndarray, model: Any = None) -> np.ndarray:
+        """
+        Queue a feature matrix and wait for its fake probabilities.
+        Only requests for the same model are batched together; model defaults to the provider's current model.
+        """
+        if len(feature_matrix) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        if model is None:
+            model = self.model_provider()
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._pending.append((feature_matrix, model, future))
+        self._pending_rows += len(feature_matrix)
+        self.total_requests += 1
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+
+            # Give concurrent requests a short window to join a partial batch
+            if self._pending_rows < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+
+            model, batch = self._take_batch()
+            if not self._pending:
+                self._wakeup.clear()
+            await self._execute(model, batch)
+
+    def _take_batch(self) -> Tuple[Any, List[Tuple[np.ndarray, asyncio.Future]]]:
+        batch = []
+        batch_model = None
+        rows = 0
+        while self._pending:
+            matrix, model, future = self._pending[0]
+            if batch and (rows + len(matrix) > self.max_batch_size or model is not batch_model):
+                break
+            self._pending.popleft()
+            self._pending_rows -= len(matrix)
+            if future.done():
+                # The waiting request was cancelled
+                continue
+            batch.append((matrix, future))
+            batch_model = model
+            rows += len(matrix)
+        return batch_model, batch
+
+    async def _execute(self, model: Any, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        if not batch:
+            return
+
+        matrices = [matrix for matrix, _ in batch]
+        rows = sum(len(matrix) for matrix in matrices)
+        self.total_batches += 1
+        self.total_rows += rows
+        self.last_batch_rows = rows
+        self.last_batch_requests = len(batch)
+        self.max_batch_rows = max(self.max_batch_rows, rows)
+
+        try:
+            stacked = matrices[0] if len(matrices) == 1 else np.vstack(matrices)
+            # Model work releases the GIL, so it runs in the model thread pool
+            probabilities = await run_model_task(
+                predict_fake_probabilities, model, stacked, self.max_batch_size
+            )
+        except Exception as e:
+            logger.error(f"Batched inference failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Fan the results back out to the waiting requests
+        offset = 0
+        for matrix, future in batch:
+            end = offset + len(matrix)
+            if not future.done():
+                future.set_result(probabilities[offset:end])
+            offset = end
+
+    async def close(self):
+        """Stop the batching worker"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and batch size statistics for tuning"""
+        return {
+            'queue_depth_requests': len(self._pending),
+            'queue_depth_rows': self._pending_rows,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'total_requests': self.total_requests,
+            'total_batches': self.total_batches,
+            'total_rows': self.total_rows,
+            'avg_batch_rows': self.total_rows / self.total_batches if self.total_batches else 0.0,
+            'avg_batch_requests': self.total_requests / self.total_batches if self.total_batches else 0.0,
+            'max_batch_rows': self.max_batch_rows,
+            'last_batch_rows': self.last_batch_rows,
+            'last_batch_requests': self.last_batch_requests,
+        }
@@ -0,0 +1,105 @@
+"""
+Production launcher.
+Loads the review model and ingests the blocklist feeds once in the master process, then forks
+gunicorn workers running uvicorn so every worker references the same physical copy of the model,
+the processed reviews and the blocklist index.
+
+Usage (from the backend directory):
+    python -m app.serve [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+Memory sharing:
+- The XGBoost booster lives in native memory that Python never writes to, so its pages stay
+  shared copy-on-write after fork.
+- NumPy arrays keep their data buffers untouched by reference counting; native `.npy`
+  artifacts are additionally memory-mapped, so reloads in any worker share the page cache.
+- gc.freeze() moves everything loaded before fork out of the garbage collector, so collections
+  in the workers do not write to (and copy) those pages.
+"""
+
+from typing import Any, Dict, Optional
+import argparse
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SERVE_HOST = os.getenv('FAKEBUSTER_HOST', '0.0.0.0')
+SERVE_PORT = int(os.getenv('FAKEBUSTER_PORT', '8000'))
+SERVE_WORKERS = int(os.getenv('FAKEBUSTER_WORKERS', str(min(4, os.cpu_count() or 1))))
+SERVE_TIMEOUT = int(os.getenv('FAKEBUSTER_WORKER_TIMEOUT', '120'))
+
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    BaseApplication = object
+    GUNICORN_AVAILABLE = False
+
+
+def uvicorn_worker_class() -> str:
+    # The worker moved to the uvicorn-worker package; older uvicorn releases still ship it
+    try:
+        import uvicorn_worker  # noqa: F401
+        return 'uvicorn_worker.UvicornWorker'
+    except ImportError:
+        return 'uvicorn.workers.UvicornWorker'
+
+
+def load_preloaded_app():
+    """Import the app and load its models and blocklist in the current (master) process"""
+    from .main import app, preload_models
+
+    preload_models()
+    # Objects created so far are never collected; keeping the collector off them
+    # avoids writing to pages that are shared with the workers
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+class FakeBusterApplication(BaseApplication):
+    """Gunicorn application that preloads the models before forking workers"""
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        return load_preloaded_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FakeBuster API with shared model memory")
+    parser.add_argument('--host', default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS)
+    parser.add_argument('--timeout', type=int, default=SERVE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not GUNICORN_AVAILABLE:
+        # Without gunicorn (e.g. on Windows) there is no fork; a single process serves all requests
+        import uvicorn
+
+        logger.warning("gunicorn not available; serving from a single uvicorn process")
+        uvicorn.run(load_preloaded_app(), host=args.host, port=args.port)
+        return
+
+    FakeBusterApplication({
+        'bind': f"{args.host}:{args.port}",
+        'workers': max(1, args.workers),
+        'worker_class': uvicorn_worker_class(),
+        'preload_app': True,
+        'timeout': args.timeout,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Request coalescing.
+Concurrent requests with the same canonical payload share one in-flight computation: the first
+caller (the leader) runs it and every caller that arrives meanwhile awaits the same result.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import hashlib
+import json
+
+from pydantic import BaseModel
+
+
+def payload_key(endpoint: str, payload: BaseModel) -> str:
+    """Canonical hash of an endpoint and its request body (field order and spacing do not matter)"""
+    canonical = json.dumps(payload.model_dump(mode='json'), sort_keys=True, separators=(',', ':'))
+    return f"{endpoint}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+class _LeaderCancelled(Exception):
+    """Set on a flight whose leader was cancelled; waiting callers run the call again"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key.
+
+    Results are not cached: a key is forgotten as soon as its call finishes. When the leader's
+    call raises, every caller that joined that flight receives the same exception and the next
+    call starts a new flight. When the leader is cancelled (e.g. its client disconnected), the
+    callers waiting on it are not: one of them becomes the new leader.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.leader_failures = 0
+        self.leader_cancellations = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(key, func)
+
+            self.coalesced += 1
+            try:
+                # Shielded so a cancelled follower does not cancel the shared flight
+                return await asyncio.shield(flight)
+            except _LeaderCancelled:
+                self.coalesced -= 1
+
+    async def _lead(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self.leader_cancellations += 1
+            flight.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            self.leader_failures += 1
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+            if not flight.done():
+                flight.set_exception(_LeaderCancelled())
+            # Mark the exception as retrieved when nobody joined the flight
+            flight.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_rate': self.coalesced / calls if calls else 0.0,
+            'leader_failures': self.leader_failures,
+            'leader_cancellations': self.leader_cancellations,
+        }
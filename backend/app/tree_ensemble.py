@@ -0,0 +1,252 @@
+"""
+Compiled tree-ensemble evaluator.
+Flattens the trees of a binary XGBoost model into NumPy arrays and evaluates a whole batch by
+walking every tree one level at a time, avoiding the per-call overhead of predict_proba.
+"""
+
+from typing import Any, Dict, Optional
+import json
+import os
+
+import numpy as np
+
+# Review model backend: 'native' calls the loaded model, 'numpy' the compiled evaluator
+INFERENCE_BACKEND = os.getenv('FAKEBUSTER_INFERENCE_BACKEND', 'native')
+INFERENCE_BACKENDS = ('native', 'numpy')
+
+# Batches larger than this go to the native model, whose multithreaded predictor wins on big
+# batches; 0 evaluates every batch with numpy
+NUMPY_BACKEND_MAX_ROWS = int(os.getenv('FAKEBUSTER_NUMPY_BACKEND_MAX_ROWS', '32'))
+
+# Largest absolute probability difference to the native model accepted by the parity check
+PARITY_TOLERANCE = float(os.getenv('FAKEBUSTER_PARITY_TOLERANCE', '1e-6'))
+
+SUPPORTED_OBJECTIVES = ('binary:logistic', 'reg:logistic')
+
+
+class CompileError(Exception):
+    """Raised when a model cannot be compiled to the NumPy evaluator"""
+
+
+# Trees are laid out as complete binary trees, so their size doubles with every level; deeper or
+# larger ensembles are served by the native model
+MAX_COMPILED_DEPTH = int(os.getenv('FAKEBUSTER_MAX_COMPILED_DEPTH', '12'))
+# Padded nodes across all trees (17 bytes each, so the default is about 70 MB)
+MAX_COMPILED_NODES = int(os.getenv('FAKEBUSTER_MAX_COMPILED_NODES', str(1 << 22)))
+
+
+class CompiledTreeEnsemble:
+    """
+    Flat array form of a tree ensemble with a predict_proba compatible with the native model.
+
+    Every tree is padded to a complete binary tree of the ensemble's depth and stored level
+    by level (children of local node i are 2i+1 and 2i+2), so walking a level needs no child
+    pointer lookups. Leaves above the last level become pass-through nodes that always go left.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        n_trees: int,
+        depth: int,
+        base_margin: float,
+        n_features: int,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.n_trees = n_trees
+        self.depth = depth
+        self.base_margin = base_margin
+        self.n_features = n_features
+
+        self.tree_size = (1 << (depth + 1)) - 1
+        self.roots = np.arange(n_trees, dtype=np.intp) * self.tree_size
+        # Global index of a child: 2 * node + (1 - root) + went_right
+        self._child_offset = 1 - self.roots
+
+    def predict_margin(self, feature_matrix: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(feature_matrix, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a (n, {self.n_features}) feature matrix, got {X.shape}")
+
+        has_missing = bool(np.isnan(X).any())
+        flat_X = X.ravel()
+        row_offset = (np.arange(len(X), dtype=np.intp) * self.n_features)[:, None]
+
+        # Current node of every (row, tree) pair
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.depth):
+            x = flat_X[row_offset + self.feature[nodes]]
+            threshold = self.threshold[nodes]
+            if has_missing:
+                went_right = np.where(np.isnan(x), ~self.default_left[nodes], x >= threshold)
+            else:
+                went_right = x >= threshold
+            nodes = 2 * nodes + self._child_offset + went_right
+
+        # Tree outputs are summed in double precision; the native predictor's float32 sum
+        # differs from it only in the last bits
+        return self.value[nodes].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, feature_matrix: np.ndarray) -> np.ndarray:
+        positive = (1.0 / (1.0 + np.exp(-self.predict_margin(feature_matrix)))).astype(np.float32)
+        return np.column_stack((1.0 - positive, positive))
+
+
+class SmallBatchModel:
+    """Evaluates small batches with the compiled ensemble and larger ones with the native model"""
+
+    def __init__(self, compiled: CompiledTreeEnsemble, native_model: Any, max_rows: int = NUMPY_BACKEND_MAX_ROWS):
+        self.compiled = compiled
+        self.native_model = native_model
+        self.max_rows = max_rows
+
+    def predict_proba(self, feature_matrix: np.ndarray) -> np.ndarray:
+        if self.max_rows and len(feature_matrix) > self.max_rows:
+            return self.native_model.predict_proba(feature_matrix)
+        return self.compiled.predict_proba(feature_matrix)
+
+
+def _booster_json(model: Any) -> Dict[str, Any]:
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    if not hasattr(booster, 'save_raw'):
+        raise CompileError(f"Unsupported review model type: {type(model).__name__}")
+    return json.loads(booster.save_raw(raw_format='json'))
+
+
+def _tree_limit(model: Any, iteration_indptr) -> Optional[int]:
+    """Number of trees the native model predicts with (sklearn models stop at best_iteration)"""
+    try:
+        best_iteration = model.best_iteration
+    except AttributeError:
+        return None
+    if best_iteration is None or not iteration_indptr:
+        return None
+    return int(iteration_indptr[min(best_iteration + 1, len(iteration_indptr) - 1)])
+
+
+def _tree_depth(tree: Dict[str, Any]) -> int:
+    left, right = tree['left_children'], tree['right_children']
+    depth = [0] * len(left)
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return max(depth)
+
+
+def compile_model(model: Any) -> CompiledTreeEnsemble:
+    """Compile a binary logistic XGBoost model (sklearn wrapper or Booster) into flat arrays"""
+    learner = _booster_json(model)['learner']
+
+    objective = learner['objective']['name']
+    if objective not in SUPPORTED_OBJECTIVES:
+        raise CompileError(f"Unsupported objective: {objective}")
+
+    gradient_booster = learner['gradient_booster']
+    if gradient_booster['name'] != 'gbtree':
+        raise CompileError(f"Unsupported booster: {gradient_booster['name']}")
+
+    params = learner['learner_model_param']
+    if int(params.get('num_class', 0)) > 1 or int(params.get('num_target', 1)) > 1:
+        raise CompileError("Only single-output binary models are supported")
+
+    base_score = float(params['base_score'].strip('[]'))
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    trees = gradient_booster['model']['trees']
+    tree_limit = _tree_limit(model, gradient_booster['model'].get('iteration_indptr'))
+    if tree_limit is not None:
+        trees = trees[:tree_limit]
+    if not trees:
+        raise CompileError("Model has no trees")
+    if any(any(tree.get('split_type', [])) for tree in trees):
+        raise CompileError("Categorical splits are not supported")
+
+    depth = max(_tree_depth(tree) for tree in trees)
+    if depth > MAX_COMPILED_DEPTH:
+        raise CompileError(f"Trees of depth {depth} are too deep to compile (limit {MAX_COMPILED_DEPTH})")
+
+    tree_size = (1 << (depth + 1)) - 1
+    n_nodes = tree_size * len(trees)
+    if n_nodes > MAX_COMPILED_NODES:
+        raise CompileError(
+            f"{len(trees)} trees of depth {depth} pad to {n_nodes} nodes (limit {MAX_COMPILED_NODES})"
+        )
+    # Padding nodes compare against +inf and go left, also for missing values
+    feature = np.zeros(n_nodes, dtype=np.intp)
+    threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+    default_left = np.ones(n_nodes, dtype=bool)
+    value = np.zeros(n_nodes, dtype=np.float32)
+
+    for tree_index, tree in enumerate(trees):
+        root = tree_index * tree_size
+        left, right = tree['left_children'], tree['right_children']
+        # (xgboost node id, position in the complete tree, level)
+        stack = [(0, 0, 0)]
+        while stack:
+            node, position, level = stack.pop()
+            if left[node] == -1:
+                # Leaves store their (already shrunk) output in split_conditions;
+                # the value goes to the leftmost descendant on the last level
+                bottom = ((position + 1) << (depth - level)) - 1
+                value[root + bottom] = tree['split_conditions'][node]
+                continue
+            feature[root + position] = tree['split_indices'][node]
+            threshold[root + position] = tree['split_conditions'][node]
+            default_left[root + position] = bool(tree['default_left'][node])
+            stack.append((left[node], 2 * position + 1, level + 1))
+            stack.append((right[node], 2 * position + 2, level + 1))
+
+    return CompiledTreeEnsemble(
+        feature=feature,
+        threshold=threshold,
+        default_left=default_left,
+        value=value,
+        n_trees=len(trees),
+        depth=depth,
+        base_margin=base_margin,
+        n_features=int(params['num_feature']),
+    )
+
+
+def parity_error(model: Any, compiled: CompiledTreeEnsemble, feature_matrix: np.ndarray) -> float:
+    """Largest absolute difference between native and compiled fake probabilities"""
+    native = np.asarray(model.predict_proba(feature_matrix))[:, -1]
+    return float(np.max(np.abs(native - compiled.predict_proba(feature_matrix)[:, 1])))
+
+
+def parity_matrix(compiled: CompiledTreeEnsemble, reference: Optional[np.ndarray] = None, n_random: int = 2048, seed: int = 0) -> np.ndarray:
+    """Rows at, just below and just above the split thresholds of every feature, with some missing values"""
+    rng = np.random.default_rng(seed)
+    is_split = np.isfinite(compiled.threshold)
+
+    columns = []
+    for feature in range(compiled.n_features):
+        cuts = compiled.threshold[is_split & (compiled.feature == feature)]
+        if len(cuts) == 0:
+            cuts = np.zeros(1, dtype=np.float32)
+        picks = rng.choice(cuts, n_random)
+        side = rng.integers(-1, 2, n_random)
+        picks = np.where(side < 0, np.nextafter(picks, np.float32(-np.inf)), picks)
+        picks = np.where(side > 0, np.nextafter(picks, np.float32(np.inf)), picks)
+        columns.append(picks)
+
+    rows = np.column_stack(columns).astype(np.float32)
+    rows[rng.random(rows.shape) < 0.02] = np.nan
+    if reference is not None:
+        rows = np.vstack((np.asarray(reference, dtype=np.float32), rows))
+    return rows
+
+
+def compile_with_parity(model: Any, reference: Optional[np.ndarray] = None, tolerance: float = PARITY_TOLERANCE) -> CompiledTreeEnsemble:
+    """Compile a model and check it against the native predictions; raises CompileError on mismatch"""
+    compiled = compile_model(model)
+    error = parity_error(model, compiled, parity_matrix(compiled, reference))
+    if error > tolerance:
+        raise CompileError(f"Compiled model differs from the native model by {error:.3g}")
+    return compiled
@@ -0,0 +1,45 @@
+"""
+Website analysis rate limiting.
+Deep website analysis is limited to once per domain per window. Legitimacy results are not
+cached: they are a few lookups on the submitted signals, cheaper than hashing a cache key.
+"""
+
+from typing import Any, Dict
+import os
+
+from .cache import LRUTTLCache
+
+# Deep analysis runs at most once per domain within this many seconds
+DEEP_ANALYSIS_WINDOW = float(os.getenv('FAKEBUSTER_DEEP_ANALYSIS_WINDOW', '3600'))
+DEEP_ANALYSIS_MAX_DOMAINS = int(os.getenv('FAKEBUSTER_DEEP_ANALYSIS_MAX_DOMAINS', '100000'))
+
+
+class DeepAnalysisLimiter:
+    """Admits deep analysis of a domain at most once per window"""
+
+    def __init__(self, window_seconds: float, max_domains: int):
+        self.window_seconds = window_seconds
+        self.recent = LRUTTLCache(max_domains, window_seconds)
+        self.admitted = 0
+        self.skipped = 0
+
+    @staticmethod
+    def domain_key(domain: str) -> str:
+        return domain.strip().lower().rstrip('.')
+
+    def admit(self, domain: str) -> bool:
+        key = self.domain_key(domain)
+        if self.recent.get(key) is not None:
+            self.skipped += 1
+            return False
+        self.recent.put(key, True)
+        self.admitted += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'window_seconds': self.window_seconds,
+            'domains': len(self.recent),
+            'admitted': self.admitted,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,92 @@
+"""
+Benchmark blocklist feed ingestion on a large generated feed.
+
+Writes a hosts-format feed (default 10M lines, with duplicates, subdomains, mixed case, URLs and
+comments), ingests it with app.feeds.ingest_feeds and reports the ingestion rate, the index size
+and the peak resident memory of the process.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_feed_ingest [--lines 10000000] [--feed /tmp/feed.hosts] [--keep]
+
+Reference run (10M lines, 8.5M distinct domains, Python 3.11):
+    generated 10,000,000 lines (216.5 MB) in 37.6 s
+    ingested 9,999,999 entries (0 invalid) into 8,499,575 domains in 36.6 s: 274k lines/s
+    index 273.7 MB (32.2 bytes per domain), peak RSS 925 MB (before ingestion 44 MB)
+Memory is dominated by the final index plus about two copies of it while the packed chunks
+are merged; the feed itself is never held in memory.
+"""
+
+import argparse
+import os
+import random
+import resource
+import string
+import time
+
+from app.feeds import ingest_feeds
+
+TLDS = ('com', 'net', 'org', 'xyz', 'info', 'co.uk', 'shop', 'top')
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_feed(path: str, lines: int, seed: int = 0):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase + string.digits
+    recent = []
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('# generated benchmark feed\n')
+        for i in range(lines - 1):
+            roll = rng.random()
+            if recent and roll < 0.15:
+                # Repeated entry, in another form
+                domain = rng.choice(recent)
+                line = rng.choice((domain.upper(), f"https://{domain}/path", f"{domain}:443"))
+            else:
+                domain = ''.join(rng.choices(letters, k=rng.randint(6, 16))) + '.' + rng.choice(TLDS)
+                if roll > 0.9:
+                    domain = f"login.{domain}"
+                line = f"0.0.0.0 {domain}" if roll < 0.6 else domain
+                if len(recent) < 100000:
+                    recent.append(domain)
+                else:
+                    recent[i % 100000] = domain
+            f.write(line + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=10_000_000)
+    parser.add_argument('--feed', default='/tmp/fakebuster_bench_feed.hosts')
+    parser.add_argument('--keep', action='store_true', help="keep the generated feed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_feed(args.feed, args.lines)
+    size_mb = os.path.getsize(args.feed) / 1e6
+    print(f"generated {args.lines:,} lines ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f} s")
+
+    rss_before = peak_rss_mb()
+    try:
+        index, report = ingest_feeds([f"hosts:{args.feed}"], include_defaults=False)
+    finally:
+        if not args.keep:
+            os.remove(args.feed)
+
+    stats = index.get_stats()
+    print(
+        f"ingested {report['entries']:,} entries ({report['invalid']:,} invalid) into "
+        f"{report['domains']:,} domains in {report['seconds']:.1f} s: "
+        f"{args.lines / report['seconds'] / 1000:.0f}k lines/s"
+    )
+    print(
+        f"index {stats['bytes'] / 1e6:.1f} MB ({stats['bytes'] / max(1, len(index)):.1f} bytes per domain), "
+        f"peak RSS {peak_rss_mb():.0f} MB (before ingestion {rss_before:.0f} MB)"
+    )
+
+
+if __name__ == '__main__':
+    main()
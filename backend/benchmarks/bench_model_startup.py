@@ -0,0 +1,118 @@
+"""
+Benchmark worker start-up: pickled models vs native artifacts.
+
+Each loader runs in a fresh interpreter so load time and resident memory are measured in isolation.
+With --synthetic a temporary models directory is generated (XGBoost classifier plus a large
+processed reviews array) and converted with app.artifacts.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_model_startup --synthetic
+    python -m benchmarks.bench_model_startup --models-dir models
+
+Reference run (--synthetic: 300 trees, 2M x 10 float32 processed reviews, Python 3.11):
+    pickle            load   44.5 ms   resident +82.0 MB
+    native            load   77.3 ms   resident  +5.6 MB
+    native-noverify   load    8.3 ms   resident  +5.4 MB
+"""
+
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+# native verifies every artifact checksum (FAKEBUSTER_VERIFY_ARTIFACTS=1); native-noverify is the default
+LOAD_MODES = ('pickle', 'native', 'native-noverify')
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux)"""
+    with open('/proc/self/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def run_child(mode: str, models_dir: str):
+    # Import the heavy libraries before measuring so only model loading is counted
+    import numpy  # noqa: F401
+    import xgboost  # noqa: F401
+    from app.artifacts import read_manifest, load_artifacts
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    if mode == 'pickle':
+        with open(os.path.join(models_dir, 'xgboost_model.pkl'), 'rb') as f:
+            review_model = pickle.load(f)
+        with open(os.path.join(models_dir, 'processed_reviews.pkl'), 'rb') as f:
+            processed_reviews = pickle.load(f)
+    else:
+        review_model, processed_reviews, _ = load_artifacts(
+            models_dir, read_manifest(models_dir), verify=(mode == 'native')
+        )
+    elapsed = time.perf_counter() - start
+    rss_mb = current_rss_mb() - rss_before
+
+    # Keep the loaded objects alive until after the measurement
+    del review_model, processed_reviews
+    print(json.dumps({'seconds': elapsed, 'rss_mb': rss_mb}))
+
+
+def make_synthetic_models(models_dir: str, rows: int, trees: int):
+    import numpy as np
+    import xgboost as xgb
+    from app.artifacts import convert_models
+
+    rng = np.random.default_rng(0)
+    X = rng.random((5000, 10), dtype=np.float32)
+    y = (X[:, 3] + X[:, 6] > 1.0).astype(int)
+    model = xgb.XGBClassifier(n_estimators=trees, max_depth=6).fit(X, y)
+
+    with open(os.path.join(models_dir, 'xgboost_model.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+    with open(os.path.join(models_dir, 'processed_reviews.pkl'), 'wb') as f:
+        pickle.dump(rng.random((rows, 10), dtype=np.float32), f)
+    convert_models(models_dir)
+
+
+def measure(mode: str, models_dir: str, repeat: int):
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_model_startup', '--child', mode, '--models-dir', models_dir],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(r['seconds'] for r in results), min(r['rss_mb'] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pickle and native model start-up")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--synthetic', action='store_true')
+    parser.add_argument('--rows', type=int, default=2_000_000, help="rows of the synthetic processed reviews array")
+    parser.add_argument('--trees', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', choices=LOAD_MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.models_dir)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        models_dir = args.models_dir
+        if args.synthetic:
+            models_dir = tmp_dir
+            make_synthetic_models(models_dir, args.rows, args.trees)
+
+        print(f"models: {models_dir}, best of {args.repeat} fresh interpreters")
+        for mode in LOAD_MODES:
+            seconds, rss_mb = measure(mode, models_dir, args.repeat)
+            print(f"  {mode:<15} load {seconds * 1000:9.1f} ms   resident +{rss_mb:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark the numpy tree-ensemble backend against the native XGBoost model.
+
+Checks parity on threshold-probing rows and real review features, then times predict_proba
+for several batch sizes on both backends.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_tree_backend [--models-dir models] [--repeat 200]
+
+Without a model in --models-dir a synthetic classifier (--trees, --depth) is trained.
+
+Reference run (synthetic, 100 trees, depth 6, Python 3.11, xgboost 3.2):
+    parity: max |native - numpy| = 2.38e-07
+    batch    1  native  173.7 us  numpy   41.9 us  speedup 4.14x
+    batch    8  native  199.3 us  numpy   72.5 us  speedup 2.75x
+    batch   64  native  266.6 us  numpy  257.3 us  speedup 1.04x
+    batch  512  native  824.7 us  numpy 1873.7 us  speedup 0.44x
+The native predictor is multithreaded and wins on large batches, which is why the numpy
+backend hands batches above FAKEBUSTER_NUMPY_BACKEND_MAX_ROWS to it.
+"""
+
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+from app.features import extract_feature_matrix
+from app.tree_ensemble import compile_model, parity_error, parity_matrix
+from benchmarks.bench_explain_levels import make_reviews
+
+BATCH_SIZES = (1, 8, 64, 512)
+
+
+def load_or_train_model(models_dir: str, trees: int, depth: int):
+    path = os.path.join(models_dir, 'xgboost_model.pkl')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f), path
+
+    import xgboost as xgb
+
+    texts = make_reviews(5000, seed=1)
+    X = extract_feature_matrix(texts)
+    rng = np.random.default_rng(0)
+    y = ((X[:, 2] > 0.05) ^ (rng.random(len(X)) < 0.2)).astype(int)
+    model = xgb.XGBClassifier(n_estimators=trees, max_depth=depth).fit(X, y)
+    return model, f"synthetic ({trees} trees, depth {depth})"
+
+
+def best_time(predict, X, repeat: int) -> float:
+    predict(X)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    model, source = load_or_train_model(args.models_dir, args.trees, args.depth)
+    compiled = compile_model(model)
+    print(f"model: {source}, {compiled.n_trees} trees, depth {compiled.depth}")
+
+    X = extract_feature_matrix(make_reviews(max(BATCH_SIZES)))
+    error = max(parity_error(model, compiled, parity_matrix(compiled)), parity_error(model, compiled, X))
+    print(f"parity: max |native - numpy| = {error:.3g}")
+
+    print(f"best of {args.repeat}")
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        native = best_time(model.predict_proba, batch, args.repeat)
+        numpy_backend = best_time(compiled.predict_proba, batch, args.repeat)
+        print(
+            f"  batch {batch_size:>4}  native {native * 1e6:9.1f} us  "
+            f"numpy {numpy_backend * 1e6:9.1f} us  speedup {native / numpy_backend:5.2f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Blocklist versions and the deltas between them.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import json
+import random
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.blocklist import BlocklistIndex, BlocklistStore
+
+
+def apply_delta(domains: set, body: bytes) -> set:
+    delta = json.loads(body)
+    return (domains - set(delta['removed'])) | set(delta['added'])
+
+
+class BlocklistDeltaTest(unittest.TestCase):
+
+    def test_delta_from_every_retained_version_reaches_the_current_list(self):
+        rng = random.Random(0)
+        universe = [f"d{i}.example" for i in range(8)]
+        for trial in range(200):
+            store = BlocklistStore(BlocklistIndex.build([]), max_history=rng.randint(1, 6))
+            seen = {store.version: set()}
+            # Few distinct contents, so versions keep coming back (reverted feeds)
+            for _ in range(rng.randint(1, 12)):
+                domains = set(rng.sample(universe, rng.randint(0, 4)))
+                index = BlocklistIndex.build(sorted(domains))
+                seen[index.version] = domains
+                store.publish(index)
+
+            current = set(store.current)
+            for version, domains in seen.items():
+                body = store.delta_body(version)
+                if body is None:
+                    continue
+                with self.subTest(trial=trial, since=version):
+                    self.assertEqual(apply_delta(domains, body), current)
+
+    def test_reverted_version_keeps_older_history(self):
+        versions = [
+            {'d1', 'd2', 'd3', 'd4', 'd5', 'd7'}, {'d4'}, {'d1'}, {'d4', 'd5', 'd6', 'd7'}, {'d4'}, set(),
+        ]
+        indexes = [BlocklistIndex.build(sorted(f"{d}.example" for d in v)) for v in versions]
+        store = BlocklistStore(indexes[0])
+        for index in indexes[1:]:
+            store.publish(index)
+
+        delta = json.loads(store.delta_body(indexes[0].version))
+        self.assertEqual(delta['added'], [])
+        self.assertIn('d4.example', delta['removed'])
+        self.assertEqual(json.loads(store.delta_body(indexes[1].version))['removed'], ['d4.example'])
+
+    def test_unknown_version_needs_the_full_list(self):
+        store = BlocklistStore(BlocklistIndex.build(['a.example']))
+        store.publish(BlocklistIndex.build(['b.example']))
+        self.assertIsNone(store.delta_body('0123456789abcdef'))
+
+
+
+class BlocklistETagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old = BlocklistIndex.build(['a.example', 'b.example'])
+        self.store = BlocklistStore(self.old)
+        self.store.publish(BlocklistIndex.build(['b.example', 'c.example']))
+        patcher = mock.patch.object(main, 'blocklist_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Without the lifespan: no models are loaded and no feeds are ingested
+        self.client = TestClient(main.app)
+
+    def test_etag_matches(self):
+        self.assertTrue(main.etag_matches('"v1"', 'v1'))
+        self.assertTrue(main.etag_matches('W/"v1"', 'v1'))
+        self.assertTrue(main.etag_matches('"v0", "v1"', 'v1'))
+        self.assertTrue(main.etag_matches('*', 'v1'))
+        self.assertFalse(main.etag_matches('"v0"', 'v1'))
+        self.assertFalse(main.etag_matches(None, 'v1'))
+        self.assertFalse(main.etag_matches('', 'v1'))
+
+    def test_full_list_is_not_sent_again_for_its_version(self):
+        response = self.client.get('/api/v1/security/malicious-domains')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['etag'], f'"{self.store.version}"')
+        self.assertEqual(response.json()['domains'], ['b.example', 'c.example'])
+
+        response = self.client.get('/api/v1/security/malicious-domains', headers={'If-None-Match': response.headers['etag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response.headers['etag'], f'"{self.store.version}"')
+        self.assertEqual(self.store.not_modified, 1)
+
+        stale = {'If-None-Match': f'"{self.old.version}"'}
+        self.assertEqual(self.client.get('/api/v1/security/malicious-domains', headers=stale).status_code, 200)
+
+    def test_delta_since_a_previous_version(self):
+        response = self.client.get('/api/v1/security/malicious-domains/delta', params={'since': self.old.version})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['etag'], f'"{self.store.version}"')
+        delta = response.json()
+        self.assertEqual((delta['added'], delta['removed']), (['c.example'], ['a.example']))
+        self.assertEqual(apply_delta({'a.example', 'b.example'}, response.content), set(self.store.current))
+
+        response = self.client.get(
+            '/api/v1/security/malicious-domains/delta',
+            params={'since': self.old.version},
+            headers={'If-None-Match': f'"{self.store.version}"'},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_delta_since_an_unknown_version_is_the_full_list(self):
+        response = self.client.get('/api/v1/security/malicious-domains/delta', params={'since': '0123456789abcdef'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertNotIn('added', body)
+        self.assertEqual(body['domains'], ['b.example', 'c.example'])
+
+
+if __name__ == '__main__':
+    unittest.main()
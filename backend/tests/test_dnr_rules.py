@@ -0,0 +1,154 @@
+"""
+Runtime updates written by the declarativeNetRequest compiler, applied the way Chrome applies them.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, List, Set
+from unittest import mock
+
+from app import dnr_rules
+from app.blocklist import BlocklistIndex
+from app.dnr_rules import CHANGES_FILE, RuleLimitError, collapse_subdomains, compile_rules, ruleset_file, ruleset_id
+
+
+def read_rulesets(rules_dir: str, shards: int) -> Dict[str, List[dict]]:
+    rulesets = {}
+    for shard in range(shards):
+        with open(os.path.join(rules_dir, ruleset_file(shard)), 'r', encoding='utf-8') as f:
+            rulesets[ruleset_id(shard)] = json.load(f)
+    return rulesets
+
+
+class InstalledExtension:
+    """Rule state of an extension running a release, updated the way Chrome applies runtime updates"""
+
+    def __init__(self, static: Dict[str, List[dict]]):
+        self.static = static
+        self.disabled: Dict[str, Set[int]] = {}
+        self.dynamic: Dict[int, dict] = {}
+
+    def apply(self, changes: dict) -> Set[str]:
+        """Domains blocked after updateStaticRules and updateDynamicRules"""
+        for update in changes['updateStaticRules']:
+            disabled = self.disabled.setdefault(update['rulesetId'], set())
+            disabled.update(update['disableRuleIds'])
+            disabled.difference_update(update['enableRuleIds'])
+        update = changes['updateDynamicRules']
+        for rule_id in update['removeRuleIds']:
+            self.dynamic.pop(rule_id, None)
+        for rule in update['addRules']:
+            self.dynamic[rule['id']] = rule
+
+        blocked = set()
+        for rule_set, rules in self.static.items():
+            for rule in rules:
+                if rule['id'] not in self.disabled.get(rule_set, ()):
+                    blocked.update(rule['condition']['requestDomains'])
+        for rule in self.dynamic.values():
+            blocked.update(rule['condition']['requestDomains'])
+        return blocked
+
+
+def read_changes_file(rules_dir: str) -> dict:
+    with open(os.path.join(rules_dir, CHANGES_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_files(directory: str) -> Dict[str, bytes]:
+    contents = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+
+OPTIONS = {'domains_per_rule': 3, 'rules_per_ruleset': 2}
+OLD_DOMAINS = [f"site{i}.example" for i in range(20)]
+
+
+class RuntimeChangesTest(unittest.TestCase):
+
+    def test_changes_turn_the_previous_build_into_the_new_list(self):
+        # Removes domains from the first and last rules, adds new ones and a covered subdomain
+        new_domains = OLD_DOMAINS[2:17] + [f"new{i}.example" for i in range(5)] + ['login.site5.example']
+
+        with tempfile.TemporaryDirectory() as rules_dir:
+            first = compile_rules(BlocklistIndex.build(OLD_DOMAINS), rules_dir, **OPTIONS)
+            extension = InstalledExtension(read_rulesets(rules_dir, first['rulesets']))
+
+            new_index = BlocklistIndex.build(new_domains)
+            compile_rules(new_index, rules_dir, **OPTIONS)
+            changes = read_changes_file(rules_dir)
+
+        expected = set(collapse_subdomains(new_index))
+        self.assertEqual(extension.apply(changes), expected)
+        self.assertNotIn('site0.example', expected)
+        # Applying the same changes again (e.g. after a restart) gives the same list
+        self.assertEqual(extension.apply(changes), expected)
+        # Disabled rules are named in the ruleset that shipped them
+        for update in changes['updateStaticRules']:
+            shipped = {rule['id'] for rule in extension.static[update['rulesetId']]}
+            self.assertTrue(set(update['disableRuleIds']) <= shipped)
+
+    def test_unchanged_list_keeps_the_changes_file(self):
+        with tempfile.TemporaryDirectory() as rules_dir:
+            compile_rules(BlocklistIndex.build(OLD_DOMAINS), rules_dir, **OPTIONS)
+            compile_rules(BlocklistIndex.build(OLD_DOMAINS[1:]), rules_dir, **OPTIONS)
+            changes = read_changes_file(rules_dir)
+
+            report = compile_rules(BlocklistIndex.build(OLD_DOMAINS[1:]), rules_dir, **OPTIONS)
+            self.assertEqual(read_changes_file(rules_dir), changes)
+            self.assertEqual(report['files_written'], [])
+        self.assertTrue(changes['updateDynamicRules']['removeRuleIds'])
+
+    def test_changes_accumulate_across_builds_without_a_baseline(self):
+        builds = [
+            OLD_DOMAINS[1:],
+            OLD_DOMAINS[1:] + ['new0.example', 'new1.example'],
+            OLD_DOMAINS[3:] + ['new1.example', 'new2.example'],
+        ]
+        with tempfile.TemporaryDirectory() as rules_dir:
+            release = compile_rules(BlocklistIndex.build(OLD_DOMAINS), rules_dir, **OPTIONS)
+            extension = InstalledExtension(read_rulesets(rules_dir, release['rulesets']))
+            for domains in builds:
+                compile_rules(BlocklistIndex.build(domains), rules_dir, **OPTIONS)
+                # Extensions on the release that missed earlier builds catch up in one step
+                self.assertEqual(InstalledExtension(extension.static).apply(read_changes_file(rules_dir)), set(domains))
+                self.assertEqual(extension.apply(read_changes_file(rules_dir)), set(domains))
+
+    def test_changes_against_a_baseline_reenable_reverted_rules(self):
+        with tempfile.TemporaryDirectory() as release_dir, tempfile.TemporaryDirectory() as rules_dir:
+            release = compile_rules(BlocklistIndex.build(OLD_DOMAINS), release_dir, **OPTIONS)
+            compile_rules(BlocklistIndex.build(OLD_DOMAINS), rules_dir, **OPTIONS)
+            extension = InstalledExtension(read_rulesets(release_dir, release['rulesets']))
+
+            for domains in (OLD_DOMAINS[1:], OLD_DOMAINS[1:] + ['new0.example'], OLD_DOMAINS):
+                compile_rules(BlocklistIndex.build(domains), rules_dir, baseline_dir=release_dir, **OPTIONS)
+                self.assertEqual(extension.apply(read_changes_file(rules_dir)), set(domains))
+
+            # Back at the release's list, nothing stays disabled or added
+            changes = read_changes_file(rules_dir)
+        self.assertEqual(changes['updateDynamicRules']['addRules'], [])
+        self.assertFalse(any(update['disableRuleIds'] for update in changes['updateStaticRules']))
+        self.assertFalse(any(extension.disabled.values()))
+
+    def test_changes_past_the_runtime_limits_fail_the_build(self):
+        with tempfile.TemporaryDirectory() as rules_dir:
+            compile_rules(BlocklistIndex.build(OLD_DOMAINS), rules_dir, **OPTIONS)
+            before = read_files(rules_dir)
+
+            with mock.patch.object(dnr_rules, 'MAX_NUMBER_OF_DISABLED_STATIC_RULES', 1):
+                with self.assertRaises(RuleLimitError):
+                    compile_rules(BlocklistIndex.build(OLD_DOMAINS[::2]), rules_dir, **OPTIONS)
+            after = read_files(rules_dir)
+        self.assertEqual(after, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Expiry and eviction of the LRU/TTL cache and the page review index built on it.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import unittest
+from unittest import mock
+
+from app import cache
+from app.cache import LRUTTLCache
+from app.page_index import PageReviewIndex, page_entry_key
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def entry(n: int) -> bytes:
+    return page_entry_key(f"{n:024x}", 0)
+
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(cache.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class LRUTTLCacheTest(ClockTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        evicted = []
+        lru = LRUTTLCache(2, on_evict=lambda key, value: evicted.append((key, value)))
+        lru.put('a', 1)
+        lru.put('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.put('c', 3)
+
+        self.assertEqual(evicted, [('b', 2)])
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+        self.assertEqual(lru.get_stats()['evictions'], 1)
+
+    def test_entries_expire_after_their_ttl(self):
+        evicted = []
+        lru = LRUTTLCache(10, ttl_seconds=60, on_evict=lambda key, value: evicted.append(key))
+        lru.put('a', 1)
+        self.clock.now += 30
+        lru.put('b', 2)
+        self.clock.now += 30
+
+        # Expiry is checked on lookup; 'b' still has half its TTL left
+        self.assertEqual(lru.get('a', 'missing'), 'missing')
+        self.assertEqual(lru.get('b'), 2)
+        self.assertEqual(evicted, ['a'])
+        stats = lru.get_stats()
+        self.assertEqual((stats['expirations'], stats['hits'], stats['misses'], stats['entries']), (1, 1, 1, 1))
+
+    def test_put_again_renews_the_ttl(self):
+        lru = LRUTTLCache(10, ttl_seconds=60)
+        lru.put('a', 1)
+        self.clock.now += 50
+        lru.put('a', 2)
+        self.clock.now += 50
+        self.assertEqual(lru.get('a'), 2)
+
+    def test_pop_does_not_report_an_eviction(self):
+        evicted = []
+        lru = LRUTTLCache(10, on_evict=lambda key, value: evicted.append(key))
+        lru.put('a', 1)
+        self.assertEqual(lru.pop('a'), 1)
+        self.assertEqual(evicted, [])
+        self.assertEqual(lru.get_stats()['evictions'], 0)
+
+
+class PageReviewIndexTest(ClockTestCase):
+
+    def test_reviews_are_counted_once_per_page(self):
+        index = PageReviewIndex(max_pages=10, ttl_seconds=None, max_reviews_per_page=10)
+        page = index.get_page('https://shop.example/p#reviews', 'v1')
+        index.add(page, entry(1), 0.9)
+        index.add(page, entry(1), 0.9)
+        index.add(page, entry(2), 0.1)
+
+        # The fragment does not make another page
+        self.assertIs(index.get_page('https://shop.example/p', 'v1'), page)
+        self.assertEqual(page.summary()['total_reviews'], 2)
+        self.assertEqual(page.fake_count, 1)
+        self.assertEqual(index.entries, 2)
+
+    def test_least_recently_used_pages_go_past_the_entry_budget(self):
+        index = PageReviewIndex(max_pages=10, ttl_seconds=None, max_reviews_per_page=10, max_entries=3)
+        first = index.get_page('https://a.example/', 'v1')
+        index.add(first, entry(1), 0.2)
+        index.add(first, entry(2), 0.2)
+        second = index.get_page('https://b.example/', 'v1')
+        index.add(second, entry(3), 0.2)
+        index.add(second, entry(4), 0.2)
+
+        self.assertFalse(first.indexed)
+        self.assertTrue(second.indexed)
+        self.assertEqual(index.entries, 2)
+        self.assertIsNot(index.get_page('https://a.example/', 'v1'), first)
+
+        # A request still holding the evicted page no longer changes the count
+        index.add(first, entry(5), 0.2)
+        self.assertEqual(index.entries, 2)
+
+    def test_page_bound_and_expiry_release_their_entries(self):
+        index = PageReviewIndex(max_pages=2, ttl_seconds=60, max_reviews_per_page=10)
+        pages = []
+        for n, url in enumerate(['https://a.example/', 'https://b.example/', 'https://c.example/']):
+            page = index.get_page(url, 'v1')
+            index.add(page, entry(n), 0.5)
+            pages.append(page)
+
+        self.assertFalse(pages[0].indexed)
+        self.assertEqual(index.entries, 2)
+
+        self.clock.now += 61
+        fresh = index.get_page('https://b.example/', 'v1')
+        self.assertIsNot(fresh, pages[1])
+        self.assertFalse(pages[1].indexed)
+        # Expiry is seen on lookup, so the third page still counts until it is looked up
+        self.assertEqual(index.entries, 1)
+        index.get_page('https://c.example/', 'v1')
+        self.assertEqual(index.entries, 0)
+        self.assertEqual(index.get_stats()['expirations'], 2)
+
+    def test_a_new_model_version_starts_the_page_over(self):
+        index = PageReviewIndex(max_pages=10, ttl_seconds=None, max_reviews_per_page=10)
+        old = index.get_page('https://a.example/', 'v1')
+        index.add(old, entry(1), 0.9)
+        new = index.get_page('https://a.example/', 'v2')
+
+        self.assertIsNot(new, old)
+        self.assertEqual((new.model_version, len(new)), ('v2', 0))
+        self.assertFalse(old.indexed)
+        self.assertEqual(index.entries, 0)
+
+    def test_page_forgets_its_oldest_reviews_past_its_bound(self):
+        index = PageReviewIndex(max_pages=10, ttl_seconds=None, max_reviews_per_page=2)
+        page = index.get_page('https://a.example/', 'v1')
+        for n, probability in enumerate([0.9, 0.2, 0.8]):
+            index.add(page, entry(n), probability)
+
+        self.assertIsNone(page.get(entry(0)))
+        self.assertEqual(page.summary(), {'fake_reviews': 1, 'total_reviews': 2, 'confidence': (0.8 + 0.8) / 2})
+        self.assertEqual(index.entries, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Cross-request batching of the inference scheduler and how model errors reach the waiting requests.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+
+import numpy as np
+
+from app.executors import shutdown_executors
+from app.scheduler import InferenceScheduler
+
+
+class RecordingModel:
+    """Fake probability = first feature; records the rows of every predict_proba call"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.batches = []
+
+    def predict_proba(self, feature_matrix):
+        self.batches.append(len(feature_matrix))
+        if self.error is not None:
+            raise self.error
+        fake = feature_matrix[:, 0]
+        return np.column_stack([1 - fake, fake])
+
+
+def features(*values):
+    return np.array([[value, 0.0] for value in values])
+
+
+class InferenceSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    def make_scheduler(self, model, max_batch_size=64):
+        # A wide batching window, so every request queued in one event loop step joins the batch
+        return InferenceScheduler(lambda: model, max_batch_size=max_batch_size, max_wait_ms=20)
+
+    async def asyncTearDown(self):
+        shutdown_executors()
+
+    async def test_concurrent_requests_share_one_model_call(self):
+        model = RecordingModel()
+        scheduler = self.make_scheduler(model)
+        try:
+            results = await asyncio.gather(
+                scheduler.predict(features(0.1, 0.2)),
+                scheduler.predict(features(0.3)),
+                scheduler.predict(features(0.4, 0.5, 0.6)),
+            )
+        finally:
+            await scheduler.close()
+
+        self.assertEqual(model.batches, [6])
+        # Every request gets its own rows back, in order
+        np.testing.assert_allclose(results[0], [0.1, 0.2])
+        np.testing.assert_allclose(results[1], [0.3])
+        np.testing.assert_allclose(results[2], [0.4, 0.5, 0.6])
+        metrics = scheduler.get_metrics()
+        self.assertEqual((metrics['total_requests'], metrics['total_batches'], metrics['total_rows']), (3, 1, 6))
+
+    async def test_batches_respect_the_size_bound_and_the_model(self):
+        model = RecordingModel()
+        other_model = RecordingModel()
+        scheduler = self.make_scheduler(model, max_batch_size=3)
+        try:
+            results = await asyncio.gather(
+                scheduler.predict(features(0.1, 0.2)),
+                scheduler.predict(features(0.3, 0.4)),
+                scheduler.predict(features(0.5), other_model),
+            )
+        finally:
+            await scheduler.close()
+
+        # The second request would overflow the first batch; the third needs another model
+        self.assertEqual(model.batches, [2, 2])
+        self.assertEqual(other_model.batches, [1])
+        np.testing.assert_allclose(np.concatenate(results), [0.1, 0.2, 0.3, 0.4, 0.5])
+
+    async def test_model_error_reaches_every_request_of_the_batch(self):
+        error = RuntimeError('model failed')
+        scheduler = self.make_scheduler(RecordingModel(error=error))
+        try:
+            results = await asyncio.gather(
+                scheduler.predict(features(0.1)),
+                scheduler.predict(features(0.2)),
+                return_exceptions=True,
+            )
+            self.assertEqual(results, [error, error])
+
+            # The worker survives the failure and serves the next batch
+            model = RecordingModel()
+            np.testing.assert_allclose(await scheduler.predict(features(0.3), model), [0.3])
+        finally:
+            await scheduler.close()
+
+    async def test_cancelled_request_is_left_out_of_the_batch(self):
+        model = RecordingModel()
+        scheduler = self.make_scheduler(model)
+        try:
+            cancelled = asyncio.create_task(scheduler.predict(features(0.1, 0.2)))
+            kept = asyncio.create_task(scheduler.predict(features(0.3)))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            np.testing.assert_allclose(await kept, [0.3])
+        finally:
+            await scheduler.close()
+
+        self.assertEqual(model.batches, [1])
+
+    async def test_empty_matrix_skips_the_queue(self):
+        model = RecordingModel()
+        scheduler = self.make_scheduler(model)
+        self.assertEqual(len(await scheduler.predict(np.empty((0, 2)))), 0)
+        self.assertEqual(model.batches, [])
+        self.assertEqual(scheduler.get_metrics()['total_requests'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
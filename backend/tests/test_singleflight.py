@@ -0,0 +1,106 @@
+"""
+Coalescing of concurrent identical calls, and what followers see when the leader fails or is cancelled.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+
+from app.singleflight import SingleFlight
+
+
+class Call:
+    """Counted call that blocks until released, then returns or raises"""
+
+    def __init__(self, result=None, error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_calls_share_one_flight(self):
+        flights = SingleFlight()
+        call = Call(result='done')
+        tasks = [asyncio.create_task(flights.do('key', call)) for _ in range(3)]
+        await call.started.wait()
+        call.release.set()
+
+        self.assertEqual(await asyncio.gather(*tasks), ['done'] * 3)
+        self.assertEqual(call.calls, 1)
+        self.assertEqual((flights.leaders, flights.coalesced), (1, 2))
+        self.assertEqual(len(flights), 0)
+
+    async def test_leader_failure_reaches_every_follower_once(self):
+        flights = SingleFlight()
+        error = ValueError('boom')
+        call = Call(error=error)
+        tasks = [asyncio.create_task(flights.do('key', call)) for _ in range(3)]
+        await call.started.wait()
+        call.release.set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(result is error for result in results))
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(flights.leader_failures, 1)
+
+        # The failure is not remembered: the next call starts a new flight
+        retry = Call(result='ok')
+        retry.release.set()
+        self.assertEqual(await flights.do('key', retry), 'ok')
+        self.assertEqual(retry.calls, 1)
+
+    async def test_cancelled_leader_hands_the_call_to_a_follower(self):
+        flights = SingleFlight()
+        call = Call(result='done')
+        leader = asyncio.create_task(flights.do('key', call))
+        await call.started.wait()
+        follower = asyncio.create_task(flights.do('key', call))
+        await asyncio.sleep(0)
+
+        call.started.clear()
+        leader.cancel()
+        await call.started.wait()
+        call.release.set()
+
+        self.assertEqual(await follower, 'done')
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        self.assertEqual(call.calls, 2)
+        self.assertEqual(flights.leader_cancellations, 1)
+        self.assertEqual((flights.leaders, flights.coalesced), (2, 0))
+        self.assertEqual(len(flights), 0)
+
+    async def test_cancelled_follower_leaves_the_flight_running(self):
+        flights = SingleFlight()
+        call = Call(result='done')
+        leader = asyncio.create_task(flights.do('key', call))
+        await call.started.wait()
+        follower = asyncio.create_task(flights.do('key', call))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await follower
+        call.release.set()
+
+        self.assertEqual(await leader, 'done')
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(flights.leader_cancellations, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Parity of the compiled tree-ensemble evaluator with the native XGBoost predictor.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+try:
+    import xgboost as xgb
+except ImportError:
+    xgb = None
+
+from app import tree_ensemble
+from app.tree_ensemble import CompileError, compile_model, parity_error, parity_matrix
+
+N_FEATURES = 12
+
+
+def training_data(rows: int = 2000, seed: int = 0):
+    """Features with about 10% missing values, so trees learn both default directions"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES)).astype(np.float32)
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] - X[:, 3] + rng.normal(scale=0.5, size=rows)) > 0).astype(int)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+
+def train(depth: int, trees: int = 30, **params):
+    X, y = training_data()
+    model = xgb.XGBClassifier(n_estimators=trees, max_depth=depth, learning_rate=0.3, **params)
+    model.fit(X, y)
+    return model
+
+
+@unittest.skipIf(xgb is None, "xgboost is not installed")
+class CompiledParityTest(unittest.TestCase):
+
+    def assert_parity(self, model, tolerance: float = 1e-6):
+        compiled = compile_model(model)
+        X, _ = training_data(500, seed=1)
+        # Threshold-probing rows (with missing values) plus held-out rows and all-missing rows
+        rows = np.vstack((parity_matrix(compiled, X), np.full((4, N_FEATURES), np.nan, dtype=np.float32)))
+        self.assertLessEqual(parity_error(model, compiled, rows), tolerance)
+        return compiled
+
+    def test_parity_across_depths(self):
+        for depth in (1, 3, 6, 10):
+            with self.subTest(depth=depth):
+                compiled = self.assert_parity(train(depth))
+                self.assertLessEqual(compiled.depth, depth)
+
+    def test_parity_with_unbalanced_trees(self):
+        # Loss-guided growth yields leaves on many levels, exercising the pass-through padding
+        self.assert_parity(train(0, grow_policy='lossguide', max_leaves=24, tree_method='hist'))
+
+    def test_parity_at_best_iteration(self):
+        X, y = training_data()
+        model = xgb.XGBClassifier(n_estimators=200, max_depth=4, early_stopping_rounds=5)
+        model.fit(X[:1500], y[:1500], eval_set=[(X[1500:], y[1500:])], verbose=False)
+        compiled = self.assert_parity(model)
+        self.assertLess(compiled.n_trees, 200)
+
+    def test_parity_of_booster(self):
+        X, y = training_data()
+        booster = xgb.train(
+            {'objective': 'binary:logistic', 'max_depth': 5}, xgb.DMatrix(X, label=y), num_boost_round=20
+        )
+        compiled = compile_model(booster)
+        rows = parity_matrix(compiled, X[:200])
+        native = booster.predict(xgb.DMatrix(rows))
+        self.assertLessEqual(np.max(np.abs(native - compiled.predict_proba(rows)[:, 1])), 1e-6)
+
+    def test_deep_trees_are_not_compiled(self):
+        model = train(8, trees=5)
+        with mock.patch.object(tree_ensemble, 'MAX_COMPILED_DEPTH', 6):
+            with self.assertRaises(CompileError):
+                compile_model(model)
+
+    def test_padding_is_bounded(self):
+        model = train(6, trees=20)
+        compiled = compile_model(model)
+        padded_nodes = compiled.n_trees * compiled.tree_size
+        with mock.patch.object(tree_ensemble, 'MAX_COMPILED_NODES', padded_nodes - 1):
+            with self.assertRaises(CompileError):
+                compile_model(model)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ class FakeBusterBackground {
     constructor() {
         this.apiBaseUrl = 'http://localhost:8000/api/v1';
         this.maliciousDomains = new Set();
+        this.maliciousDomainsVersion = null;
         this.trustedDomains = new Set();
         this.setupEventListeners();
         this.loadMaliciousDomains();
@@ -204,9 +205,10 @@ class FakeBusterBackground {
     async loadMaliciousDomains() {
         try {
             // Load from local storage first
-            const stored = await chrome.storage.local.get(['malicious_domains']);
+            const stored = await chrome.storage.local.get(['malicious_domains', 'malicious_domains_version']);
             if (stored.malicious_domains) {
                 this.maliciousDomains = new Set(stored.malicious_domains);
+                this.maliciousDomainsVersion = stored.malicious_domains_version || null;
             }
 
             // Update from server
@@ -218,23 +220,33 @@ class FakeBusterBackground {
 
     async updateMaliciousDomainsList() {
         try {
-            const response = await this.makeAPICall('/security/malicious-domains', {}, 'GET');
-            const domains = response.domains || [];
-            
-            this.maliciousDomains = new Set(domains);
+            // With a known version only the changes since that version are downloaded
+            const response = this.maliciousDomainsVersion
+                ? await this.makeAPICall('/security/malicious-domains/delta', { since: this.maliciousDomainsVersion }, 'GET')
+                : await this.makeAPICall('/security/malicious-domains', {}, 'GET');
+
+            if (response.added || response.removed) {
+                (response.added || []).forEach(domain => this.maliciousDomains.add(domain));
+                (response.removed || []).forEach(domain => this.maliciousDomains.delete(domain));
+            } else {
+                this.maliciousDomains = new Set(response.domains || []);
+            }
+            this.maliciousDomainsVersion = response.version || null;
             
             // Store locally for offline access
             await chrome.storage.local.set({ 
-                malicious_domains: domains,
+                malicious_domains: Array.from(this.maliciousDomains),
+                malicious_domains_version: this.maliciousDomainsVersion,
                 last_updated: Date.now()
             });
             
-            console.log(`Updated malicious domains list: ${domains.length} domains`);
+            console.log(`Updated malicious domains list: ${this.maliciousDomains.size} domains`);
         } catch (error) {
             console.error('Error updating malicious domains:', error);
             
             // Use offline fallback data
             this.maliciousDomains = new Set(this.offlineMaliciousDomains);
+            this.maliciousDomainsVersion = null;
             console.log('Using offline malicious domains list');
         }
     }